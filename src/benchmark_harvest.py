@@ -0,0 +1,81 @@
+"""
+Throughput benchmark for the harvest client against the local replay server.
+
+Starts s2_replay_server.ReplayServer in-process with a simulated latency
+and rate limit, harvests a set of queries through SemanticScholarClient,
+and reports papers per second together with the number of requests,
+retries and 429s for each client rate. Running client rates above the
+server's limit shows how the client's backoff behaves under throttling.
+
+Usage:
+    python benchmark_harvest.py --papers 20000 --server-rate 10 --client-rates 5 10 20
+    python benchmark_harvest.py --from-bib ../refs.bib --mode relevance
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from s2_replay_server import ReplayServer, papers_from_bib, synthetic_papers
+from semantic_scholar import SemanticScholarClient, harvest
+
+def run_benchmark(server, queries, client_rate, burst=1, mode='bulk', backoff=0.1):
+    """
+    Harvests ``queries`` concurrently and returns a dict of measurements.
+    """
+    client = SemanticScholarClient(api_key='', rate=client_rate, burst=burst, base_url=server.url,
+                                   backoff=backoff, max_retries=10)
+    with tempfile.TemporaryDirectory() as tmp:
+        tasks = [harvest(client, query, os.path.join(tmp, f"{i}.jsonl"), mode=mode)
+                 for i, query in enumerate(queries)]
+
+        async def run_all():
+            return await asyncio.gather(*tasks)
+
+        start = time.perf_counter()
+        checkpoints = asyncio.run(run_all())
+        elapsed = time.perf_counter() - start
+    client.close()
+
+    papers = sum(checkpoint['harvested'] for checkpoint in checkpoints)
+    return {
+        'client_rate': client_rate,
+        'papers': papers,
+        'seconds': elapsed,
+        'papers_per_second': papers / elapsed if elapsed else float('inf'),
+        'requests': client.stats['requests'],
+        'retries': client.stats['retries'],
+        'throttled': client.stats['throttled'],
+    }
+
+def print_table(rows):
+    print(f"{'client rate':>11} {'papers':>8} {'seconds':>8} {'papers/s':>9} "
+          f"{'requests':>8} {'retries':>7} {'429s':>5}")
+    for row in rows:
+        print(f"{row['client_rate']:>11.1f} {row['papers']:>8} {row['seconds']:>8.2f} "
+              f"{row['papers_per_second']:>9.1f} {row['requests']:>8} {row['retries']:>7} "
+              f"{row['throttled']:>5}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the harvest client offline.")
+    parser.add_argument('--papers', type=int, default=5000, help="synthetic papers to serve")
+    parser.add_argument('--from-bib', help="serve this bib's entries instead of synthetic papers")
+    parser.add_argument('--queries', nargs='+', default=['fish', 'plankton', 'sonar'])
+    parser.add_argument('--mode', choices=['bulk', 'relevance'], default='bulk')
+    parser.add_argument('--latency', type=float, default=0.02, help="simulated seconds per response")
+    parser.add_argument('--server-rate', type=float, default=10.0, help="server requests/s before 429")
+    parser.add_argument('--server-burst', type=int, default=1)
+    parser.add_argument('--client-rates', type=float, nargs='+', default=[5.0, 10.0, 20.0])
+    args = parser.parse_args()
+
+    papers = papers_from_bib(args.from_bib) if args.from_bib else synthetic_papers(args.papers)
+    rows = []
+    with ReplayServer(papers, latency=args.latency, rate=args.server_rate,
+                      burst=args.server_burst) as server:
+        for client_rate in args.client_rates:
+            rows.append(run_benchmark(server, args.queries, client_rate, mode=args.mode))
+    print(f"Server: {len(papers)} papers, {args.latency * 1000:.0f} ms latency, "
+          f"{args.server_rate} req/s limit, mode={args.mode}")
+    print_table(rows)
@@ -1,34 +1,44 @@
-import re
+from corpus import load_corpus
 from bertopic import BERTopic
+from embedding_store import EMBEDDING_MODEL, embed_abstracts
+from online_bertopic import print_online_topics, update_online_topics
 from sklearn.feature_extraction.text import CountVectorizer
 
-def bertopic_analysis(input_file):
-    with open(input_file, 'r') as f:
-        content = f.read()
+def bertopic_analysis(input_file, incremental=False):
+    """
+    Prints the BERTopic topics of the abstracts in a bib file.
 
-    entries = content.split('\n@')
-    abstracts = []
-
-    for entry in entries:
-        if not entry.strip():
-            continue
-
-        if 'abstract' in entry:
-            abstract_match = re.search(r'abstract\s*=\s*{(.*?)}', entry, re.IGNORECASE | re.DOTALL)
-            if abstract_match:
-                abstracts.append(abstract_match.group(1))
+    Args:
+        input_file (str): The bib file.
+        incremental (bool): Update the saved online model with the new
+                            abstracts instead of refitting (see online_bertopic.py).
+    """
+    abstracts = [entry.get('abstract') for entry in load_corpus(input_file) if 'abstract' in entry.fields]
 
     if len(abstracts) < 10: # BERTopic needs a minimum number of documents
         print("Not enough documents to perform BERTopic analysis.")
         return
 
-    print("Running BERTopic analysis... This may take a few minutes.")
+    if incremental:
+        model, state, trained, assigned = update_online_topics(input_file, abstracts)
+        print(f"Trained on {trained} new abstracts; {assigned} assigned and queued for the next batch.")
+        if model is None:
+            print("Not enough documents yet to start the incremental model.")
+            return
+        print_online_topics(model, state)
+        return
+
+    # Embeddings are cached per abstract, so only new or edited abstracts are encoded
+    embeddings, encoded = embed_abstracts(abstracts, input_file)
+    print(f"Encoded {encoded} of {len(abstracts)} abstracts ({len(abstracts) - encoded} cached).")
+
+    print("Running BERTopic analysis...")
     # Initialize BERTopic model with a CountVectorizer that removes stop words
     vectorizer_model = CountVectorizer(stop_words="english")
-    topic_model = BERTopic(vectorizer_model=vectorizer_model, verbose=True)
+    topic_model = BERTopic(embedding_model=EMBEDDING_MODEL, vectorizer_model=vectorizer_model, verbose=True)
 
     # Fit the model on the abstracts
-    topics, _ = topic_model.fit_transform(abstracts)
+    topics, _ = topic_model.fit_transform(abstracts, embeddings=embeddings)
 
     # Get the topic information
     topic_info = topic_model.get_topic_info()
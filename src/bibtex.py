@@ -0,0 +1,596 @@
+"""
+Shared BibTeX parser used by every script in this repository.
+
+The parser streams the file entry by entry and tokenizes each entry exactly
+once, so the cost of reading a bibliography no longer grows with the number
+of fields a script looks at. Field values may be braced (with arbitrary
+nesting), quoted, bare numbers (``year = 2024``) or ``@string`` macros, and
+may be concatenated with ``#``.
+
+Files are memory-mapped rather than read, so even multi-GB exports are
+scanned with flat memory. ``BibIndex`` goes one step further: it keeps only
+entry offsets and citation keys, and decodes a field the first time it is
+asked for. ``parse_bibtex_parallel`` splits large files into shards at entry
+boundaries and tokenizes them in a process pool.
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import unicodedata
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+# An entry starts at a line whose first non-blank character is '@'.
+_ENTRY_START = re.compile(rb'^[ \t]*@', re.MULTILINE)
+_ENTRY_HEAD = re.compile(rb'[ \t]*@\s*([A-Za-z][\w-]*)\s*([{(])')
+_FIELD_NAME = re.compile(rb'[\s,]*([^\s=,{}()"#]+)\s*=\s*')
+_BARE_VALUE = re.compile(rb'[^\s,#{}()"]+')
+_CONCAT = re.compile(rb'\s*#\s*')
+_BRACES = re.compile(rb'[{}]')
+_DELIMITERS = re.compile(rb'[{}()]')
+_QUOTE_OR_BRACES = re.compile(rb'[{}"]')
+_WHITESPACE = re.compile(r'\s+')
+_YEAR = re.compile(r'\d{4}')
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+_DOI_PREFIX = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:)', re.IGNORECASE)
+
+# Entry types that carry no bibliographic record.
+_SKIPPED_TYPES = {'comment', 'preamble'}
+
+
+class _FieldAccess:
+    """Convenience accessors shared by eager and lazy entries."""
+
+    __slots__ = ()
+
+    def text(self, name, default=''):
+        """Returns a field with braces removed and whitespace collapsed."""
+        value = self.get(name, None)
+        if value is None:
+            return default
+        return clean_text(value)
+
+    @property
+    def title(self):
+        return self.text('title')
+
+    @property
+    def abstract(self):
+        return self.text('abstract')
+
+    @property
+    def doi(self):
+        return self.text('doi')
+
+    @property
+    def year(self):
+        """The publication year as an int, or None if it cannot be read."""
+        match = _YEAR.search(self.get('year'))
+        return int(match.group()) if match else None
+
+
+class BibEntry(_FieldAccess):
+    """
+    A single parsed BibTeX entry.
+
+    Field names are lower-cased; values are the decoded text between the
+    outer delimiters, with any inner braces left untouched. ``start`` and
+    ``end`` are the byte offsets of the entry in the source file and
+    ``digest`` is the SHA-1 of its source bytes.
+    """
+
+    __slots__ = ('entry_type', 'key', 'fields', 'start', 'end', 'digest', 'raw')
+
+    def __init__(self, entry_type, key, fields, start=0, end=0, digest=None, raw=None):
+        self.entry_type = entry_type
+        self.key = key
+        self.fields = fields
+        self.start = start
+        self.end = end
+        self.digest = digest
+        self.raw = raw
+
+    def __repr__(self):
+        return f"BibEntry({self.entry_type!r}, {self.key!r})"
+
+    def get(self, name, default=''):
+        """Returns the raw value of a field, or ``default`` if it is missing."""
+        return self.fields.get(name, default)
+
+
+def clean_text(value):
+    """Strips BibTeX braces and collapses runs of whitespace."""
+    value = value.replace('{', '').replace('}', '')
+    return _WHITESPACE.sub(' ', value).strip()
+
+
+def normalize_doi(doi):
+    """Lower-cases a DOI and strips any ``https://doi.org/`` or ``doi:`` prefix."""
+    return _DOI_PREFIX.sub('', doi.strip()).lower()
+
+
+def normalize_title(title):
+    """
+    Reduces a title to lower-case alphanumeric words, so that titles which
+    differ only in case, braces, punctuation or accents compare equal.
+    """
+    title = unicodedata.normalize('NFKD', clean_text(title)).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(_NON_ALNUM.sub(' ', title.lower()).split())
+
+
+def _match_brace(data, pos, end):
+    """Returns the index just past the brace that closes the one at ``pos``."""
+    depth = 0
+    for match in _BRACES.finditer(data, pos, end):
+        if match.group() == b'{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return end
+
+
+def _match_quote(data, pos, end):
+    """Returns the index just past the '"' that closes the one at ``pos``."""
+    depth = 0
+    for match in _QUOTE_OR_BRACES.finditer(data, pos + 1, end):
+        char = match.group()
+        if char == b'{':
+            depth += 1
+        elif char == b'}':
+            depth -= 1
+        elif depth == 0:
+            return match.end()
+    return end
+
+
+def _scan_value(data, pos, end):
+    """
+    Finds the pieces of one (possibly '#'-concatenated) field value.
+
+    Returns a list of ``(start, end, is_bare)`` spans and the index just past
+    the value. Nothing is decoded, so skipping a value costs only a scan.
+    """
+    parts = []
+    while pos < end:
+        char = data[pos:pos + 1]
+        if char == b'{':
+            close = _match_brace(data, pos, end)
+            parts.append((pos + 1, close - 1, False))
+            pos = close
+        elif char == b'"':
+            close = _match_quote(data, pos, end)
+            parts.append((pos + 1, close - 1, False))
+            pos = close
+        else:
+            match = _BARE_VALUE.match(data, pos, end)
+            if not match:
+                break
+            parts.append((pos, match.end(), True))
+            pos = match.end()
+
+        concat = _CONCAT.match(data, pos, end)
+        if concat and b'#' in concat.group():
+            pos = concat.end()
+        else:
+            break
+    return parts, pos
+
+
+def _decode_value(data, parts, macros):
+    """Decodes the spans returned by ``_scan_value``, expanding macros."""
+    pieces = []
+    for start, end, is_bare in parts:
+        text = data[start:end].decode('utf-8', 'replace')
+        if is_bare and not text.isdigit():
+            text = macros.get(text.lower(), text)
+        pieces.append(text)
+    return ''.join(pieces)
+
+
+def _scan_fields(data, pos, end):
+    """Yields ``(name, parts)`` for every ``name = value`` pair from ``pos``."""
+    while True:
+        name = _FIELD_NAME.match(data, pos, end)
+        if not name:
+            return
+        parts, pos = _scan_value(data, name.end(), end)
+        yield name.group(1).decode('utf-8', 'replace').lower(), parts
+
+
+def _parse_head(data, start, end):
+    """Returns ``(entry_type, key, fields_start)`` or None if not an entry."""
+    head = _ENTRY_HEAD.match(data, start, end)
+    if not head:
+        return None
+
+    entry_type = head.group(1).decode('ascii').lower()
+    pos = head.end()
+    if entry_type in _SKIPPED_TYPES or entry_type == 'string':
+        return entry_type, None, pos
+
+    comma = data.find(b',', pos, end)
+    key_end = comma if comma != -1 else end
+    key = bytes(data[pos:key_end]).strip().rstrip(b'})').strip()
+    return entry_type, key.decode('utf-8', 'replace'), key_end
+
+
+def parse_entry(data, start=0, end=None, offset=0, macros=None):
+    """
+    Tokenizes the entry in ``data[start:end]``.
+
+    Args:
+        data (bytes): Buffer holding the entry (any bytes-like object).
+        start (int): Index of the '@' that opens the entry.
+        end (int): Index just past the entry; defaults to ``len(data)``.
+        offset (int): Added to ``start``/``end`` to give file offsets.
+        macros (dict): ``@string`` definitions seen so far. Updated in place
+                       when the entry is itself an ``@string``.
+
+    Returns:
+        BibEntry, or None for ``@comment``, ``@preamble``, ``@string`` and
+        anything that does not look like an entry.
+    """
+    if end is None:
+        end = len(data)
+    if macros is None:
+        macros = {}
+
+    head = _parse_head(data, start, end)
+    if head is None or head[0] in _SKIPPED_TYPES:
+        return None
+    entry_type, key, pos = head
+
+    fields = {}
+    for name, parts in _scan_fields(data, pos, end):
+        fields.setdefault(name, _decode_value(data, parts, macros))
+
+    if entry_type == 'string':
+        macros.update(fields)
+        return None
+
+    return BibEntry(entry_type, key, fields, offset + start, offset + end)
+
+
+def _entry_close(buf, head, limit, end):
+    """
+    Index just past the delimiter that closes the entry whose head is ``head``.
+
+    Braces are counted from the entry's own ``{`` or ``(``; a paren entry
+    ends at the ``)`` that balances its ``(`` outside any braces. The scan
+    continues past the line starting with '@' at ``limit`` only while that
+    line sits inside an open value and does not itself look like an entry
+    head, so a value with a line such as "@handle" is kept whole. Returns
+    None if the entry does not close before the scan has to stop.
+    """
+    parens = head.group(2) == b'('
+    pattern = _DELIMITERS if parens else _BRACES
+    depth = 0
+    paren_depth = 0
+    for token in pattern.finditer(buf, head.end(), end):
+        while token.start() >= limit:
+            if depth == 0 or _ENTRY_HEAD.match(buf, limit, end):
+                return None
+            following = _ENTRY_START.search(buf, limit + 1, end)
+            limit = following.start() if following else end
+        char = token.group()
+        if char == b'{':
+            depth += 1
+        elif char == b'}':
+            depth -= 1
+            if depth < 0:
+                if not parens:
+                    return token.end()
+                depth = 0
+        elif depth == 0:
+            if char == b'(':
+                paren_depth += 1
+            else:
+                paren_depth -= 1
+                if paren_depth < 0:
+                    return token.end()
+    return None
+
+
+def _entry_spans(buf, pos=0, end=None):
+    """
+    Yields ``(start, end)`` byte spans of the entries in ``buf``.
+
+    An entry runs from its '@' until the brace (or parenthesis) that opened
+    it is balanced, even across lines that start with '@' inside a value.
+    If it never balances, it runs until the next line starting with '@'
+    (which recovers from unbalanced entries the way the old
+    ``split('\\n@')`` did).
+    """
+    if end is None:
+        end = len(buf)
+    match = _ENTRY_START.search(buf, pos, end)
+    while match:
+        start = match.end() - 1
+        following = _ENTRY_START.search(buf, match.end(), end)
+        limit = following.start() if following else end
+
+        head = _ENTRY_HEAD.match(buf, start, limit)
+        close = _entry_close(buf, head, limit, end) if head else None
+        if close is None:
+            close = limit
+
+        yield start, close
+        match = following if close <= limit else _ENTRY_START.search(buf, close, end)
+
+
+def _map_file(f):
+    """Read-only mmap of an open file, or empty bytes for an empty file."""
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        return b''
+
+
+def iter_raw_entries(path):
+    """
+    Yields ``(start, data)`` for every entry in a BibTeX file.
+
+    The file is memory-mapped, so only the entry being yielded is copied
+    into memory.
+    """
+    with open(path, 'rb') as f:
+        buf = _map_file(f)
+        try:
+            for start, end in _entry_spans(buf):
+                yield start, buf[start:end]
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+
+
+def entry_digest(data):
+    """Content hash used to tell whether an entry's source bytes changed."""
+    return hashlib.sha1(data).hexdigest()
+
+
+def iter_entries(path, keep_raw=False):
+    """
+    Streams the parsed entries of a BibTeX file in file order.
+
+    Args:
+        path (str): Path to the ``.bib`` file.
+        keep_raw (bool): If True, each entry's source text is kept in
+                         ``entry.raw`` so it can be written back out.
+    """
+    macros = {}
+    for start, data in iter_raw_entries(path):
+        entry = parse_entry(data, offset=start, macros=macros)
+        if entry is None:
+            continue
+        entry.digest = entry_digest(data)
+        if keep_raw:
+            entry.raw = data.decode('utf-8', 'replace')
+        yield entry
+
+
+def parse_bibtex(path, keep_raw=False):
+    """Parses a whole BibTeX file into a list of BibEntry records."""
+    return list(iter_entries(path, keep_raw=keep_raw))
+
+
+# Below this many entries the pool costs more than it saves.
+_MIN_PARALLEL_ENTRIES = 2000
+_SHARDS_PER_WORKER = 4
+
+
+def _parse_shard(path, spans, macros):
+    """Worker: parses the entries at the given spans into plain tuples."""
+    records = []
+    with open(path, 'rb') as f:
+        buf = _map_file(f)
+        try:
+            for i in range(0, len(spans), 2):
+                start, end = spans[i], spans[i + 1]
+                entry = parse_entry(buf, start, end, macros=macros)
+                if entry is not None:
+                    records.append((entry.entry_type, entry.key, entry.fields,
+                                    entry.start, entry.end, entry_digest(buf[start:end])))
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+    return records
+
+
+def parse_bibtex_parallel(path, workers=None, macros=None):
+    """
+    Parses a BibTeX file in a process pool; the result equals ``parse_bibtex``.
+
+    The parent scans the mapped file for entry boundaries, cuts the entries
+    into shards of roughly equal byte size and hands each worker the spans of
+    its shard together with the ``@string`` macros defined before it. Records
+    come back in file order.
+
+    Args:
+        path (str): Path to the ``.bib`` file.
+        workers (int): Pool size; defaults to the number of CPUs.
+        macros (dict): If given, updated with the file's ``@string`` macros.
+    """
+    if macros is None:
+        macros = {}
+    workers = workers or os.cpu_count() or 1
+
+    with open(path, 'rb') as f:
+        buf = _map_file(f)
+        try:
+            spans = array('q')
+            string_positions = []
+            for start, end in _entry_spans(buf):
+                head = _ENTRY_HEAD.match(buf, start, end)
+                if head and head.group(1).lower() == b'string':
+                    string_positions.append(len(spans))
+                spans.append(start)
+                spans.append(end)
+
+            if workers == 1 or len(spans) // 2 < _MIN_PARALLEL_ENTRIES:
+                return [BibEntry(*record) for record in _parse_shard(path, spans, macros)]
+
+            # Cut shards of roughly equal bytes. Each shard starts with the
+            # macros defined before it; workers pick up later ones themselves.
+            shard_bytes = max(1, len(buf) // (workers * _SHARDS_PER_WORKER))
+            shards = []
+            shard_start = 0
+            shard_macros = dict(macros)
+            strings = iter(string_positions)
+            next_string = next(strings, None)
+            for i in range(0, len(spans), 2):
+                if i > shard_start and spans[i + 1] - spans[shard_start] > shard_bytes:
+                    shards.append((spans[shard_start:i], shard_macros))
+                    shard_start = i
+                    shard_macros = dict(macros)
+                if i == next_string:
+                    parse_entry(buf, spans[i], spans[i + 1], macros=macros)
+                    next_string = next(strings, None)
+            shards.append((spans[shard_start:], shard_macros))
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+
+    entries = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_parse_shard, path, shard_spans, shard_macros)
+                   for shard_spans, shard_macros in shards]
+        for future in futures:
+            entries.extend(BibEntry(*record) for record in future.result())
+    return entries
+
+
+class LazyEntry(_FieldAccess):
+    """
+    An entry of a ``BibIndex`` whose fields are decoded on first access.
+
+    The first ``get`` records where each field's value lies in the mapped
+    file; only the values that are actually asked for are decoded.
+    """
+
+    __slots__ = ('_index', 'entry_type', 'key', 'start', 'end', '_spans', '_values')
+
+    def __init__(self, index, entry_type, key, start, end):
+        self._index = index
+        self.entry_type = entry_type
+        self.key = key
+        self.start = start
+        self.end = end
+        self._spans = None
+        self._values = {}
+
+    def __repr__(self):
+        return f"LazyEntry({self.entry_type!r}, {self.key!r})"
+
+    def _field_spans(self):
+        if self._spans is None:
+            buf = self._index.buffer
+            pos = _parse_head(buf, self.start, self.end)[2]
+            spans = {}
+            for name, parts in _scan_fields(buf, pos, self.end):
+                spans.setdefault(name, parts)
+            self._spans = spans
+        return self._spans
+
+    def __contains__(self, name):
+        return name in self._field_spans()
+
+    def get(self, name, default=''):
+        """Returns the raw value of a field, decoding it on first access."""
+        value = self._values.get(name)
+        if value is None:
+            parts = self._field_spans().get(name)
+            if parts is None:
+                return default
+            value = _decode_value(self._index.buffer, parts, self._index.macros)
+            self._values[name] = value
+        return value
+
+    @property
+    def fields(self):
+        """All fields decoded into a dict (defeats the laziness)."""
+        return {name: self.get(name) for name in self._field_spans()}
+
+    @property
+    def raw(self):
+        """The entry's source bytes."""
+        return self._index.buffer[self.start:self.end]
+
+    def to_entry(self):
+        """Materializes a regular BibEntry."""
+        return BibEntry(self.entry_type, self.key, self.fields, self.start, self.end,
+                        entry_digest(self.raw))
+
+
+class BibIndex:
+    """
+    Offset index over a memory-mapped BibTeX file.
+
+    Building the index reads only each entry's type and citation key, and
+    stores start/end offsets in compact arrays. Entries are handed out as
+    ``LazyEntry`` objects, so streaming over a huge export never
+    materializes fields (such as abstracts) that the caller does not read.
+
+    ``@string`` macros are collected while indexing and applied to every
+    entry regardless of where in the file they were defined.
+
+    Usage:
+        with BibIndex('refs.bib') as index:
+            for entry in index:
+                print(entry.key, entry.get('type'))
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self.buffer = _map_file(self._file)
+        self.starts = array('q')
+        self.ends = array('q')
+        self.types = []
+        self.keys = []
+        self.macros = {}
+        self._positions = None
+
+        for start, end in _entry_spans(self.buffer):
+            head = _parse_head(self.buffer, start, end)
+            if head is None or head[0] in _SKIPPED_TYPES:
+                continue
+            if head[0] == 'string':
+                parse_entry(self.buffer, start, end, macros=self.macros)
+                continue
+            self.starts.append(start)
+            self.ends.append(end)
+            self.types.append(head[0])
+            self.keys.append(head[1])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, i):
+        return LazyEntry(self, self.types[i], self.keys[i], self.starts[i], self.ends[i])
+
+    def __iter__(self):
+        for i in range(len(self.keys)):
+            yield self[i]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def position(self, key):
+        """Index of the first entry with this citation key, or None."""
+        if self._positions is None:
+            self._positions = {}
+            for i, k in enumerate(self.keys):
+                self._positions.setdefault(k, i)
+        return self._positions.get(key)
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self._file.close()
@@ -0,0 +1,267 @@
+"""
+Cached access to the parsed bibliography.
+
+``load_corpus`` parses a ``.bib`` file once and stores the records in a
+pickle under ``.bibcache/`` next to the bib. Later calls reuse the pickle as
+long as the file's size and mtime are unchanged, or - if only the mtime
+moved - its content hash still matches.
+
+When the bib has been edited, only entries whose bytes changed are parsed
+again; every other record is carried forward from the cache. Consumers that
+keep derived state (e.g. ``categorized_papers.json``) can save a snapshot of
+the entry digests they last saw and ask ``diff_corpus`` for the
+added/changed/removed delta instead of reprocessing the full corpus.
+
+Metadata fetched by ``enrich_metadata.py`` (e.g. abstracts of entries that
+only have a DOI) lives in a sidecar file and is overlaid on the entries that
+``load_corpus`` returns; the bib itself is never rewritten.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+from bibtex import (BibEntry, entry_digest, iter_entries, iter_raw_entries, normalize_doi,
+                    parse_bibtex_parallel, parse_entry)
+
+CACHE_DIR_NAME = '.bibcache'
+CACHE_VERSION = 2
+
+# Full parses of files at least this large are sharded over a process pool.
+PARALLEL_PARSE_BYTES = 32 << 20
+
+
+def cache_dir(bib_path):
+    """Returns (and creates) the cache directory that sits next to a bib file."""
+    path = os.path.join(os.path.dirname(os.path.abspath(bib_path)), CACHE_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_digest(path):
+    """SHA-1 of a file's contents, read in 1 MiB blocks."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_path(bib_path):
+    return os.path.join(cache_dir(bib_path), os.path.basename(bib_path) + '.corpus.pickle')
+
+
+def _write_pickle(path, payload):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, 'rb') as f:
+            payload = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if payload.get('version') != CACHE_VERSION:
+        return None
+    return payload
+
+
+def _to_entries(records):
+    return [BibEntry(*record) for record in records]
+
+
+def _to_records(entries):
+    return [(e.entry_type, e.key, e.fields, e.start, e.end, e.digest) for e in entries]
+
+
+def _reparse_changed(bib_path, payload):
+    """
+    Re-parses only the entries whose bytes differ from the cached ones.
+
+    Returns the entries and the ``@string`` macros, or None when the macros
+    changed - that can alter any entry, so the caller falls back to a full
+    parse.
+    """
+    cached = {record[5]: record for record in payload['records']}
+    macros = {}
+    entries = []
+
+    for start, data in iter_raw_entries(bib_path):
+        digest = entry_digest(data)
+        record = cached.get(digest)
+        if record is not None:
+            entry_type, key, fields = record[:3]
+            entries.append(BibEntry(entry_type, key, fields, start, start + len(data), digest))
+            continue
+        entry = parse_entry(data, offset=start, macros=macros)
+        if entry is not None:
+            entry.digest = digest
+            entries.append(entry)
+
+    if macros != payload['macros']:
+        return None
+    return entries, macros
+
+
+def load_corpus(bib_path, use_cache=True, enrich=True):
+    """
+    Returns the parsed entries of a bib file, using the on-disk cache.
+
+    Args:
+        bib_path (str): Path to the ``.bib`` file.
+        use_cache (bool): If False, always parse and leave the cache alone.
+        enrich (bool): Fill fields missing from the bib with the metadata
+                       saved by enrich_metadata.py.
+    """
+    entries = _load_entries(bib_path, use_cache)
+    if enrich:
+        apply_enrichment(entries, load_enrichment(bib_path))
+    return entries
+
+
+def _load_entries(bib_path, use_cache):
+    if not use_cache:
+        return list(iter_entries(bib_path))
+
+    stat = os.stat(bib_path)
+    cache_path = _cache_path(bib_path)
+    payload = _read_cache(cache_path)
+
+    if payload is not None:
+        if payload['size'] == stat.st_size and payload['mtime_ns'] == stat.st_mtime_ns:
+            return _to_entries(payload['records'])
+
+        digest = file_digest(bib_path)
+        if payload['sha1'] == digest:
+            # Touched but unchanged: refresh the stamp so the next run skips hashing.
+            payload['mtime_ns'] = stat.st_mtime_ns
+            _write_pickle(cache_path, payload)
+            return _to_entries(payload['records'])
+
+        result = _reparse_changed(bib_path, payload)
+    else:
+        digest = file_digest(bib_path)
+        result = None
+
+    if result is None and stat.st_size >= PARALLEL_PARSE_BYTES:
+        macros = {}
+        entries = parse_bibtex_parallel(bib_path, macros=macros)
+    elif result is None:
+        macros = {}
+        entries = []
+        for start, data in iter_raw_entries(bib_path):
+            entry = parse_entry(data, offset=start, macros=macros)
+            if entry is not None:
+                entry.digest = entry_digest(data)
+                entries.append(entry)
+    else:
+        entries, macros = result
+
+    _write_pickle(cache_path, {
+        'version': CACHE_VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha1': digest,
+        'macros': macros,
+        'records': _to_records(entries),
+    })
+    return entries
+
+
+def enrichment_path(bib_path):
+    return os.path.join(cache_dir(bib_path), os.path.basename(bib_path) + '.enriched.json')
+
+
+def load_enrichment(bib_path):
+    """Returns the ``{normalized_doi: {field: value}}`` sidecar, or {}."""
+    try:
+        with open(enrichment_path(bib_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_enrichment(bib_path, enrichment):
+    path = enrichment_path(bib_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(enrichment, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def apply_enrichment(entries, enrichment):
+    """Fills fields that are missing or empty in the bib from the sidecar."""
+    if not enrichment:
+        return
+    for entry in entries:
+        extra = enrichment.get(normalize_doi(entry.get('doi')))
+        if not extra:
+            continue
+        missing = {name: value for name, value in extra.items() if not entry.get(name).strip()}
+        if missing:
+            entry.fields = {**entry.fields, **missing}
+
+
+class CorpusDelta:
+    """
+    Difference between the current corpus and a consumer's snapshot.
+
+    ``added`` and ``changed`` hold BibEntry records; ``removed`` holds the
+    citation keys that are no longer in the bib.
+    """
+
+    __slots__ = ('added', 'changed', 'removed')
+
+    def __init__(self, added, changed, removed):
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+    def __repr__(self):
+        return f"CorpusDelta(+{len(self.added)} ~{len(self.changed)} -{len(self.removed)})"
+
+
+def snapshot_path(bib_path, consumer):
+    """Where a named consumer keeps the snapshot of the entries it processed."""
+    return os.path.join(cache_dir(bib_path), f'{consumer}.snapshot.json')
+
+
+def load_snapshot(path):
+    """Returns the ``{citation_key: [digest, ...]}`` snapshot at ``path``, or None."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_snapshot(path, entries):
+    # Citation keys are not guaranteed unique, so each key maps to a list.
+    snapshot = {}
+    for entry in entries:
+        snapshot.setdefault(entry.key, []).append(entry.digest)
+    with open(path, 'w') as f:
+        json.dump(snapshot, f)
+
+
+def diff_corpus(entries, snapshot):
+    """Compares the parsed entries against a snapshot from ``load_snapshot``."""
+    added = []
+    changed = []
+    seen = set()
+    for entry in entries:
+        seen.add(entry.key)
+        previous = snapshot.get(entry.key)
+        if previous is None:
+            added.append(entry)
+        elif entry.digest not in previous:
+            changed.append(entry)
+    removed = [key for key in snapshot if key not in seen]
+    return CorpusDelta(added, changed, removed)
@@ -0,0 +1,221 @@
+"""
+Finds entries of a bib file that describe the same paper.
+
+Merged exports list some papers more than once: a Scopus ``@CONFERENCE``
+record next to a hand-written ``@article``, or a preprint next to the
+published version, under different keys and with slightly different titles.
+Two stages find them without comparing every pair of entries:
+
+  1. exact: entries with the same normalized DOI or normalized title;
+  2. near: MinHash signatures of the word shingles of title and abstract,
+     bucketed with LSH (BANDS bands of ROWS rows), so only entries sharing a
+     bucket are compared. Candidates are kept when the Jaccard similarity
+     of their shingle sets is at least SIMILARITY.
+
+Matches are grouped transitively. Each group keeps one canonical entry:
+the one with a DOI, an abstract and the most fields, earliest in the file
+on ties. The result is a merge report and a ``{citation_key: canonical key}``
+mapping.
+
+Usage:
+    python dedupe.py --bib ../refs.bib --mapping dedupe_map.json
+"""
+
+import argparse
+import json
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from bibtex import normalize_doi, normalize_title
+from corpus import load_corpus
+
+SHINGLE_WORDS = 3
+NUM_HASHES = 128
+BANDS = 32
+ROWS = NUM_HASHES // BANDS
+SIMILARITY = 0.5
+
+# Hashes are taken modulo a Mersenne prime below 2**31, so products of two
+# of them fit in 64 bits.
+_PRIME = (1 << 31) - 1
+
+
+def shingles(entry, size=SHINGLE_WORDS):
+    """Hashed word n-grams of an entry's normalized title and abstract."""
+    words = normalize_title(entry.title + ' ' + entry.abstract).split()
+    if len(words) < size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))} if words else set()
+    return {zlib.crc32(' '.join(words[i:i + size]).encode('utf-8'))
+            for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """Min-wise hash signatures under ``num_hashes`` random linear hash functions."""
+
+    def __init__(self, num_hashes=NUM_HASHES, seed=0):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, num_hashes, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, num_hashes, dtype=np.uint64)
+
+    def signature(self, hashes):
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes)) % _PRIME
+        return ((np.outer(values, self.a) + self.b) % _PRIME).min(axis=0)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def candidate_pairs(signatures, bands=BANDS):
+    """Pairs of rows whose signatures agree on every row of at least one band."""
+    rows = signatures.shape[1] // bands
+    pairs = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        chunk = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for i, row in enumerate(chunk):
+            buckets[row.tobytes()].append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((members[x], members[y]))
+    return pairs
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            self.parent[max(i, j)] = min(i, j)
+
+
+def _title_similarity(a, b):
+    return jaccard(set(normalize_title(a.title).split()), set(normalize_title(b.title).split()))
+
+
+def _canonical_rank(entry, position):
+    return (not entry.doi, not entry.abstract, -len(entry.fields), position)
+
+
+def find_duplicates(entries, similarity=SIMILARITY, bands=BANDS, num_hashes=NUM_HASHES):
+    """
+    Groups entries that describe the same paper.
+
+    Args:
+        entries (list): Parsed bib entries.
+        similarity (float): Minimum shingle Jaccard similarity of near duplicates.
+
+    Returns:
+        tuple: ``(duplicates, conflicts)``. ``duplicates`` has one dict per
+               group of two or more entries, with ``canonical`` (an entry
+               index), ``members`` (entry indices, in file order) and
+               ``reasons`` (``(i, j, reason)`` for each matching pair).
+               ``conflicts`` lists ``(i, j)`` pairs that share a DOI but
+               not a title, which usually means a wrong DOI; they are not
+               merged.
+    """
+    groups = _UnionFind(len(entries))
+    reasons = []
+    conflicts = []
+
+    first_seen = {}
+    for i, entry in enumerate(entries):
+        for kind, value in (('doi', normalize_doi(entry.doi)), ('title', normalize_title(entry.title))):
+            if not value:
+                continue
+            j = first_seen.setdefault((kind, value), i)
+            if j == i:
+                continue
+            if kind == 'doi' and _title_similarity(entries[i], entries[j]) < similarity:
+                conflicts.append((j, i))
+                continue
+            groups.union(j, i)
+            reasons.append((j, i, f'same {kind}'))
+
+    shingle_sets = [shingles(entry) for entry in entries]
+    hasher = MinHasher(num_hashes)
+    hashed = [i for i, shingle_set in enumerate(shingle_sets) if shingle_set]
+    if len(hashed) > 1:
+        signatures = np.vstack([hasher.signature(shingle_sets[i]) for i in hashed])
+        for x, y in sorted(candidate_pairs(signatures, bands)):
+            i, j = hashed[x], hashed[y]
+            if groups.find(i) == groups.find(j):
+                continue
+            score = jaccard(shingle_sets[i], shingle_sets[j])
+            if score >= similarity:
+                groups.union(i, j)
+                reasons.append((i, j, f'similar text (Jaccard {score:.2f})'))
+
+    members = defaultdict(list)
+    for i in range(len(entries)):
+        members[groups.find(i)].append(i)
+    grouped_reasons = defaultdict(list)
+    for i, j, reason in reasons:
+        grouped_reasons[groups.find(i)].append((i, j, reason))
+
+    duplicates = []
+    for root, indices in sorted(members.items()):
+        if len(indices) < 2:
+            continue
+        canonical = min(indices, key=lambda i: _canonical_rank(entries[i], i))
+        duplicates.append({'canonical': canonical, 'members': indices, 'reasons': grouped_reasons[root]})
+    return duplicates, conflicts
+
+
+def canonical_keys(entries, duplicates):
+    """``{citation_key: canonical citation_key}`` for every entry."""
+    mapping = {}
+    for entry in entries:
+        mapping.setdefault(entry.key, entry.key)
+    for group in duplicates:
+        canonical = entries[group['canonical']].key
+        for i in group['members']:
+            mapping[entries[i].key] = canonical
+    return mapping
+
+
+def print_report(entries, duplicates, conflicts=()):
+    def describe(i):
+        return f"{entries[i].key} (@{entries[i].entry_type})"
+
+    for group in duplicates:
+        canonical = group['canonical']
+        print(f"{describe(canonical)}: {entries[canonical].title}")
+        for i in group['members']:
+            if i != canonical:
+                print(f"  merge {describe(i)}: {entries[i].title}")
+        for i, j, reason in group['reasons']:
+            print(f"    {entries[i].key} ~ {entries[j].key}: {reason}")
+    for i, j in conflicts:
+        print(f"Not merged, same DOI but different titles: {entries[i].key} and {entries[j].key}")
+    extra = sum(len(group['members']) - 1 for group in duplicates)
+    print(f"{len(entries)} entries, {len(duplicates)} papers listed more than once, "
+          f"{len(entries) - extra} distinct papers")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find duplicate papers in a bib file.")
+    parser.add_argument('--bib', default='/Users/woodj/Desktop/congenial-potato/refs.bib')
+    parser.add_argument('--similarity', type=float, default=SIMILARITY)
+    parser.add_argument('--mapping', help="write the citation key -> canonical key mapping to this JSON file")
+    args = parser.parse_args()
+
+    entries = load_corpus(args.bib)
+    duplicates, conflicts = find_duplicates(entries, args.similarity)
+    print_report(entries, duplicates, conflicts)
+
+    if args.mapping:
+        with open(args.mapping, 'w') as f:
+            json.dump(canonical_keys(entries, duplicates), f, indent=4)
+        print(f"Canonical keys saved to {args.mapping}")
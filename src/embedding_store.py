@@ -0,0 +1,151 @@
+"""
+Persistent sentence-embedding cache for the BERTopic scripts.
+
+Embeddings of one model live in ``.bibcache/embeddings/<model>.f32``, a raw
+float32 matrix that is memory-mapped on read, with ``<model>.index.json``
+mapping each text's SHA-1 to its row. ``EmbeddingStore.embed`` returns the
+rows of texts seen before and encodes only the rest, in batches, appending
+them to the matrix. The sentence-transformer is only loaded when something
+actually needs encoding.
+
+Rows are appended before the index is rewritten, so an interrupted run
+leaves at most some unindexed rows at the end of the matrix; they are cut
+off on the next write. Rows of abstracts that were edited or removed are
+dropped by ``compact`` once they outnumber the live ones.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from corpus import cache_dir
+
+# The default English model of BERTopic.
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+ENCODE_BATCH_SIZE = 64
+
+
+def embedding_cache_dir(bib_path):
+    return os.path.join(cache_dir(bib_path), 'embeddings')
+
+
+def text_digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Args:
+        directory (str): Where the matrix and index are kept.
+        model_name (str): Sentence-transformer model; each model has its own files.
+        encoder (callable): Maps a list of texts to a 2-D array. Defaults to
+                            the sentence-transformer named ``model_name``.
+    """
+
+    def __init__(self, directory, model_name=EMBEDDING_MODEL, encoder=None):
+        os.makedirs(directory, exist_ok=True)
+        slug = model_name.replace('/', '__')
+        self.model_name = model_name
+        self.matrix_path = os.path.join(directory, slug + '.f32')
+        self.index_path = os.path.join(directory, slug + '.index.json')
+        self._encoder = encoder
+        self.encoded = 0
+
+        try:
+            with open(self.index_path, 'r') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = None
+        if stored is None or stored.get('model') != model_name:
+            stored = {'model': model_name, 'dim': None, 'rows': {}}
+        self.dim = stored['dim']
+        self.rows = stored['rows']
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _encode(self, texts):
+        if self._encoder is None:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(self.model_name)
+            self._encoder = lambda batch: model.encode(batch, batch_size=len(batch))
+        return np.asarray(self._encoder(texts), dtype=np.float32)
+
+    def matrix(self):
+        """All stored rows, memory-mapped read-only."""
+        if not self.rows:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.matrix_path, dtype=np.float32, mode='r', shape=(len(self.rows), self.dim))
+
+    def embed(self, texts, batch_size=ENCODE_BATCH_SIZE):
+        """
+        Embeddings of ``texts`` as an ``(n, dim)`` float32 array, in order.
+
+        Only texts without a stored embedding are encoded.
+        """
+        digests = [text_digest(text) for text in texts]
+        missing = {}
+        for text, digest in zip(texts, digests):
+            if digest not in self.rows and digest not in missing:
+                missing[digest] = text
+
+        if missing:
+            pending = list(missing.items())
+            with open(self.matrix_path, 'ab') as f:
+                # Drop rows left behind by an interrupted run.
+                f.truncate(len(self.rows) * (self.dim or 0) * 4)
+                for start in range(0, len(pending), batch_size):
+                    batch = pending[start:start + batch_size]
+                    vectors = self._encode([text for _, text in batch])
+                    if self.dim is None:
+                        self.dim = vectors.shape[1]
+                    f.write(vectors.tobytes())
+                    for digest, _ in batch:
+                        self.rows[digest] = len(self.rows)
+                    self.encoded += len(batch)
+            self._save_index()
+
+        if not texts:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        stored = self.matrix()
+        return np.array(stored[[self.rows[digest] for digest in digests]])
+
+    def compact(self, texts):
+        """Keeps only the rows of ``texts``; returns the number of rows dropped."""
+        keep = [digest for digest in dict.fromkeys(text_digest(text) for text in texts)
+                if digest in self.rows]
+        dropped = len(self.rows) - len(keep)
+        if not dropped:
+            return 0
+        vectors = np.array(self.matrix()[[self.rows[digest] for digest in keep]])
+        tmp_path = self.matrix_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(vectors.tobytes())
+        os.replace(tmp_path, self.matrix_path)
+        self.rows = {digest: row for row, digest in enumerate(keep)}
+        self._save_index()
+        return dropped
+
+    def _save_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'model': self.model_name, 'dim': self.dim, 'rows': self.rows}, f)
+        os.replace(tmp_path, self.index_path)
+
+
+def embed_abstracts(abstracts, bib_path, model_name=EMBEDDING_MODEL, batch_size=ENCODE_BATCH_SIZE):
+    """
+    Cached embeddings of a bib file's abstracts.
+
+    Returns:
+        tuple: ``(embeddings, encoded)``, where ``encoded`` is how many
+               abstracts had to be run through the model.
+    """
+    store = EmbeddingStore(embedding_cache_dir(bib_path), model_name)
+    embeddings = store.embed(abstracts, batch_size)
+    if len(store) > 2 * len(set(abstracts)):
+        store.compact(abstracts)
+    return embeddings, store.encoded
@@ -0,0 +1,127 @@
+"""
+Fills in metadata that refs.bib entries are missing, looked up by DOI.
+
+Many Scopus exports carry a DOI but no abstract, which makes every
+abstract-based stage (topic models, keyword filters, categorization) drop or
+misclassify them. This script collects those entries across the corpus and
+resolves them through the Semantic Scholar /paper/batch endpoint, a few
+hundred DOIs per request over one pooled session. The results are saved in
+the corpus sidecar (see corpus.py), so load_corpus() serves the merged
+entries to every script.
+
+Usage:
+    python enrich_metadata.py ../refs.bib
+    python enrich_metadata.py ../refs.bib --base-url http://127.0.0.1:8000/graph/v1
+"""
+
+import argparse
+import asyncio
+
+from bibtex import normalize_doi
+from corpus import load_corpus, load_enrichment, save_enrichment
+from semantic_scholar import API_ROOT, BATCH_LIMIT, SemanticScholarClient
+
+# Semantic Scholar field -> bib field.
+FIELD_MAP = {
+    'abstract': 'abstract',
+    'year': 'year',
+    'venue': 'journal',
+}
+
+def find_missing(entries, fields, enrichment=None):
+    """
+    Returns ``{normalized_doi: [bib fields]}`` for entries that have a DOI
+    but lack some of ``fields`` (bib field names), skipping what the
+    sidecar already provides.
+    """
+    enrichment = enrichment or {}
+    missing = {}
+    for entry in entries:
+        doi = normalize_doi(entry.get('doi'))
+        if not doi:
+            continue
+        known = enrichment.get(doi, {})
+        wanted = [field for field in fields if not entry.get(field).strip() and field not in known]
+        if wanted:
+            missing.setdefault(doi, [])
+            missing[doi].extend(field for field in wanted if field not in missing[doi])
+    return missing
+
+async def fetch_metadata(client, dois, s2_fields, chunk_size=BATCH_LIMIT):
+    """
+    Resolves DOIs in chunks.
+
+    Returns:
+        tuple: ``({doi: paper}, failed)`` where ``failed`` lists
+               ``(chunk, exception)`` for the chunks whose request failed.
+    """
+    chunks = [dois[i:i + chunk_size] for i in range(0, len(dois), chunk_size)]
+    tasks = [client.paper_batch([f"DOI:{doi}" for doi in chunk], ','.join(s2_fields))
+             for chunk in chunks]
+    found = {}
+    failed = []
+    for chunk, papers in zip(chunks, await asyncio.gather(*tasks, return_exceptions=True)):
+        if isinstance(papers, Exception):
+            failed.append((chunk, papers))
+            continue
+        for doi, paper in zip(chunk, papers):
+            if paper:
+                found[doi] = paper
+    return found, failed
+
+def enrich_corpus(bib_path, client=None, fields=('abstract',), chunk_size=BATCH_LIMIT):
+    """
+    Looks up missing fields for every entry with a DOI and merges them into
+    the corpus sidecar. Results of the chunks that succeeded are saved
+    even if others failed; those DOIs are looked up again on the next run.
+
+    Returns:
+        tuple: (number of DOIs looked up, number of fields filled,
+                number of DOIs whose lookup failed).
+    """
+    s2_fields = [name for name, bib_field in FIELD_MAP.items() if bib_field in fields]
+    enrichment = load_enrichment(bib_path)
+    entries = load_corpus(bib_path, enrich=False)
+    missing = find_missing(entries, fields, enrichment)
+    if not missing:
+        return 0, 0, 0
+
+    own_client = client is None
+    client = client or SemanticScholarClient()
+    try:
+        found, failed = asyncio.run(fetch_metadata(client, sorted(missing), s2_fields, chunk_size))
+    finally:
+        if own_client:
+            client.close()
+    for chunk, error in failed:
+        print(f"Lookup of {len(chunk)} DOIs ({chunk[0]} ...) failed: {error}")
+
+    filled = 0
+    for doi, paper in found.items():
+        for s2_field in s2_fields:
+            bib_field = FIELD_MAP[s2_field]
+            value = paper.get(s2_field)
+            if bib_field in missing[doi] and value not in (None, ''):
+                enrichment.setdefault(doi, {})[bib_field] = str(value)
+                filled += 1
+
+    save_enrichment(bib_path, enrichment)
+    return len(missing), filled, sum(len(chunk) for chunk, _ in failed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill missing bib fields via DOI lookups.")
+    parser.add_argument('bib', nargs='?', default='/Users/woodj/Desktop/congenial-potato/refs.bib')
+    parser.add_argument('--fields', nargs='+', default=['abstract'], choices=sorted(set(FIELD_MAP.values())),
+                        help="bib fields to fill (default: abstract)")
+    parser.add_argument('--chunk-size', type=int, default=BATCH_LIMIT, help="DOIs per batch request")
+    parser.add_argument('--base-url', default=API_ROOT, help="API root, e.g. a local stand-in server")
+    args = parser.parse_args()
+
+    client = SemanticScholarClient(base_url=args.base_url)
+    try:
+        looked_up, filled, failed = enrich_corpus(args.bib, client, args.fields, args.chunk_size)
+    finally:
+        client.close()
+    print(f"Looked up {looked_up} DOIs, filled {filled} fields.")
+    if failed:
+        print(f"{failed} DOIs could not be looked up; run again to retry them.")
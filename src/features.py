@@ -0,0 +1,138 @@
+"""
+Shared document-term matrix stage for the topic-model scripts.
+
+``document_term_matrix`` fits the CountVectorizer used by topic_modeling.py
+and filter_topic_and_keywords_v3.py once per corpus and stores the sparse
+counts and vocabulary in ``.bibcache/dtm/<digest>.npz``. The digest covers
+the document texts and the vectorizer parameters, so any consumer asking
+for the same abstracts with the same parameters gets the stored matrix
+instead of re-tokenizing, and an edited abstract or a parameter change
+produces a new entry. Only the most recently used matrices are kept.
+"""
+
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+from corpus import cache_dir
+
+VECTORIZER_PARAMS = {'max_df': 0.95, 'min_df': 2, 'stop_words': 'english'}
+
+# Matrices kept per cache directory; the least recently used go first.
+DTM_CACHE_KEEP = 8
+
+
+class DocumentTermMatrix:
+    """
+    Token counts of a corpus.
+
+    Attributes:
+        matrix (scipy.sparse.csr_matrix): Documents x terms counts.
+        vocabulary (numpy.ndarray): Term of each column, like
+                                    ``CountVectorizer.get_feature_names_out()``.
+        params (dict): The CountVectorizer parameters used.
+        digest (str): Cache key of the texts and parameters.
+    """
+
+    def __init__(self, matrix, vocabulary, params, digest):
+        self.matrix = matrix
+        self.vocabulary = vocabulary
+        self.params = params
+        self.digest = digest
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def vectorizer(self):
+        """A CountVectorizer with this vocabulary, for transforming new texts."""
+        params = {name: value for name, value in self.params.items() if name not in ('max_df', 'min_df')}
+        return CountVectorizer(vocabulary=list(self.vocabulary), **params)
+
+
+def dtm_cache_dir(bib_path):
+    """Where the matrices of a bib file's documents are stored."""
+    return os.path.join(cache_dir(bib_path), 'dtm')
+
+
+def corpus_digest(texts, params):
+    """SHA-256 of the document texts, in order, and the vectorizer parameters."""
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8'))
+    for text in texts:
+        data = text.encode('utf-8')
+        digest.update(len(data).to_bytes(8, 'little'))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def _save(path, features):
+    matrix = features.matrix
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, data=matrix.data.astype(np.int32), indices=matrix.indices,
+                        indptr=matrix.indptr, shape=np.array(matrix.shape),
+                        vocabulary=features.vocabulary.astype(str))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, path)
+
+
+def _load(path, params, digest):
+    try:
+        with np.load(path, allow_pickle=False) as stored:
+            matrix = sparse.csr_matrix((stored['data'], stored['indices'], stored['indptr']),
+                                       shape=tuple(stored['shape']))
+            vocabulary = stored['vocabulary'].astype(object)
+    except (OSError, ValueError, KeyError):
+        return None
+    os.utime(path)
+    return DocumentTermMatrix(matrix, vocabulary, params, digest)
+
+
+def _prune(directory, keep):
+    stored = sorted((entry for entry in os.scandir(directory) if entry.name.endswith('.npz')),
+                    key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in stored[keep:]:
+        os.remove(entry.path)
+
+
+def document_term_matrix(texts, params=None, cache_directory=None):
+    """
+    Token counts of ``texts``, from the cache when possible.
+
+    Args:
+        texts (list): Document texts, e.g. abstracts.
+        params (dict): CountVectorizer parameters; defaults to VECTORIZER_PARAMS.
+        cache_directory (str): Where matrices are stored (see ``dtm_cache_dir``);
+                               None disables caching.
+
+    Returns:
+        DocumentTermMatrix: Rows in the order of ``texts``.
+
+    Raises:
+        ValueError: If the vectorizer finds no terms, as CountVectorizer does.
+    """
+    params = dict(VECTORIZER_PARAMS if params is None else params)
+    digest = corpus_digest(texts, params)
+
+    path = None
+    if cache_directory is not None:
+        os.makedirs(cache_directory, exist_ok=True)
+        path = os.path.join(cache_directory, digest + '.npz')
+        features = _load(path, params, digest) if os.path.exists(path) else None
+        if features is not None:
+            return features
+
+    vectorizer = CountVectorizer(**params)
+    matrix = vectorizer.fit_transform(texts).tocsr()
+    features = DocumentTermMatrix(matrix, vectorizer.get_feature_names_out(), params, digest)
+
+    if path is not None:
+        _save(path, features)
+        _prune(cache_directory, DTM_CACHE_KEEP)
+    return features
@@ -1,57 +1,82 @@
 
-import re
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.decomposition import LatentDirichletAllocation
+import os
 
-def filter_by_topic_and_keywords(input_file, output_file, topics_to_include, keywords, num_topics=10):
-    with open(input_file, 'r') as f:
-        content = f.read()
+from bibtex import iter_entries
+from corpus import apply_enrichment, load_enrichment
+from topic_store import load_topic_model
 
-    entries = content.split('\n@')
+def filter_by_topic_and_keywords(input_file, output_file, topics_to_include, keywords, num_topics=10,
+                                 refit=False, enrichment_source=None):
+    """
+    Writes the entries whose dominant topic is selected and whose abstract
+    contains one of the keywords.
+
+    The topic model is fitted once and saved (see topic_store.py); later
+    runs only assign new or edited abstracts to topics.
+
+    Args:
+        input_file (str): The bib file to filter.
+        output_file (str): Where the matching entries are written.
+        topics_to_include (list): Topic indices, or signatures (lists of
+                                  words) that stay valid across refits.
+        keywords (list): Keywords, matched case-insensitively.
+        num_topics (int): Number of LDA topics.
+        refit (bool): Fit and save a new model version.
+        enrichment_source (str): The bib enrich_metadata.py was run on; its
+                                 sidecar supplies missing abstracts. Defaults
+                                 to refs.bib next to ``input_file``.
+    """
     abstracts = []
     entry_mapping = []
 
-    for i, entry in enumerate(entries):
-        if not entry.strip():
-            continue
-
-        if 'abstract' in entry:
-            abstract_match = re.search(r'abstract\s*=\s*{(.*?)}', entry, re.IGNORECASE | re.DOTALL)
-            if abstract_match:
-                abstracts.append(abstract_match.group(1))
-                entry_mapping.append(entry)
+    # Abstracts fetched by enrich_metadata.py count as if they were in the bib.
+    # The sidecar is keyed by DOI, so the one of the unfiltered corpus covers
+    # the filtered file too.
+    if enrichment_source is None:
+        enrichment_source = os.path.join(os.path.dirname(os.path.abspath(input_file)), 'refs.bib')
+    enrichment = load_enrichment(enrichment_source)
+    enrichment.update(load_enrichment(input_file))
+    entries = list(iter_entries(input_file, keep_raw=True))
+    apply_enrichment(entries, enrichment)
+    for entry in entries:
+        if 'abstract' in entry.fields:
+            abstracts.append(entry.get('abstract'))
+            entry_mapping.append(entry)
 
     if not abstracts:
         print("No abstracts found.")
         return
 
-    vectorizer = CountVectorizer(max_df=0.95, min_df=2, stop_words='english')
     try:
-        dtm = vectorizer.fit_transform(abstracts)
+        model = load_topic_model(input_file, abstracts, num_topics, refit)
     except ValueError:
         print("Could not vectorize abstracts. Maybe they are all stop words?")
         return
 
-    lda = LatentDirichletAllocation(n_components=num_topics, random_state=0)
-    topic_assignments = lda.fit_transform(dtm)
+    topics_to_include = model.select(topics_to_include)
+    top_words = model.top_words(5)
+    for topic in sorted(topics_to_include):
+        print(f"Topic {topic}: {' '.join(top_words[topic])}")
+
+    topic_assignments = model.transform(abstracts)
 
     filtered_entries = []
     for i, entry in enumerate(entry_mapping):
         if topic_assignments[i].argmax() in topics_to_include:
-            abstract_match = re.search(r'abstract\s*=\s*{(.*?)}', entry, re.IGNORECASE | re.DOTALL)
-            if abstract_match:
-                abstract = abstract_match.group(1)
-                if any(keyword.lower() in abstract.lower() for keyword in keywords):
-                    if not entry.startswith('@'):
-                        entry = '@' + entry
-                    filtered_entries.append(entry)
+            abstract = abstracts[i]
+            if any(keyword.lower() in abstract.lower() for keyword in keywords):
+                filtered_entries.append(entry.raw)
 
     with open(output_file, 'w') as f:
-        f.write('\n'.join(filtered_entries))
+        f.write('\n\n'.join(filtered_entries) + '\n')
 
 if __name__ == "__main__":
     # Topics to include (0-indexed)
     # Topic 1, 2, 4, 6, 8
+    # Indices refer to the saved model; a signature such as
+    # ["stock", "assessment", "fisheries"] selects a topic by its top words
+    # and keeps working after a refit.
     topics = [0, 1, 3, 5, 7]
     keywords = ["biomass", "abundance", "distribution", "stock assessment", "population"]
-    filter_by_topic_and_keywords("/Users/woodj/Desktop/congenial-potato/filtered_by_type.bib", "/Users/woodj/Desktop/congenial-potato/final_filtered_refs.bib", topics, keywords)
+    filter_by_topic_and_keywords("/Users/woodj/Desktop/congenial-potato/filtered_by_type.bib", "/Users/woodj/Desktop/congenial-potato/final_filtered_refs.bib", topics, keywords,
+                                 enrichment_source="/Users/woodj/Desktop/congenial-potato/refs.bib")
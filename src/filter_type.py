@@ -1,36 +1,189 @@
+"""
+Streaming filter for bib files.
 
+A filter is a list of clauses that must all hold. Each clause is compiled
+once into a test on a parsed entry:
 
+    type=Article|Conference paper|Review    field value is one of these
+    source!=Scopus                          field value is none of these
+    publication_stage=Final
+    entrytype=article                       the @type of the entry
+    year=2020..2024                         numeric range; either end may be open
+    year>=2020                              also <=, >, <, =, !=
+    cited>=5                                the "Cited by: N" count in note
+    has:abstract                            field present and not empty
+    !has:abstract
+
+Text values are compared case-insensitively after stripping braces.
+Entries without a year or citation count fail numeric clauses.
+
+Entries come from a ``BibIndex`` over the memory-mapped input, so only
+the fields a clause asks for are decoded (abstracts of huge exports are
+never materialized unless a clause tests them), and matching entries are
+written out straight away.
+
+Clauses are tested in order and stop at the first that fails; the report
+gives, per clause, how many entries reached it and how many passed, so the
+most selective clauses can be put first.
+
+Usage:
+    python filter_type.py --where "type=Article|Review" --where "year=2020.." --where has:abstract
+"""
+
+import argparse
 import re
 
-def filter_bibtex_type(input_file, output_file, types):
-    with open(input_file, 'r') as f:
-        content = f.read()
+from bibtex import BibIndex
+
+_CLAUSE = re.compile(r'\s*([\w-]+)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$')
+_HAS = re.compile(r'\s*(!?)has:([\w-]+)\s*$')
+_CITED_BY = re.compile(r'Cited by:\s*(\d+)', re.IGNORECASE)
+_NUMBER = re.compile(r'-?\d+')
+
+_COMPARISONS = {
+    '=': lambda value, bound: value == bound,
+    '!=': lambda value, bound: value != bound,
+    '>=': lambda value, bound: value >= bound,
+    '<=': lambda value, bound: value <= bound,
+    '>': lambda value, bound: value > bound,
+    '<': lambda value, bound: value < bound,
+}
+
+
+def cited_by(entry):
+    """The citation count Scopus exports put in ``note``, or None."""
+    match = _CITED_BY.search(entry.get('note'))
+    return int(match.group(1)) if match else None
+
+
+# Fields with a numeric value, and how to read it from an entry.
+NUMERIC_FIELDS = {
+    'year': lambda entry: entry.year,
+    'cited': cited_by,
+}
+
+
+def _parse_number(text, clause):
+    if not _NUMBER.fullmatch(text):
+        raise ValueError(f"Expected a number in clause {clause!r}")
+    return int(text)
+
+
+def _compile_clause(clause):
+    """Returns a test ``entry -> bool`` for one clause."""
+    has = _HAS.match(clause)
+    if has:
+        negate, name = has.group(1) == '!', has.group(2).lower()
+        return lambda entry: bool(entry.text(name)) != negate
 
-    entries = content.split('\n@')
-    filtered_entries = []
+    match = _CLAUSE.match(clause)
+    if not match:
+        raise ValueError(f"Cannot parse filter clause {clause!r}")
+    name, operator, value = match.group(1).lower(), match.group(2), match.group(3)
 
-    for entry in entries:
-        if not entry.strip():
-            continue
+    if name in NUMERIC_FIELDS:
+        read = NUMERIC_FIELDS[name]
+        if '..' in value and operator in ('=', '!='):
+            low, high = (part.strip() for part in value.split('..', 1))
+            low = _parse_number(low, clause) if low else None
+            high = _parse_number(high, clause) if high else None
 
-        # Ensure entry starts with @
-        if not entry.startswith('@'):
-            entry = '@' + entry
+            def in_range(entry):
+                number = read(entry)
+                if number is None:
+                    return False
+                inside = (low is None or number >= low) and (high is None or number <= high)
+                return inside if operator == '=' else not inside
+            return in_range
 
-        # Check if 'type' field is present
-        if 'type' in entry:
-            # Extract type
-            type_match = re.search(r'type\s*=\s*{(.*?)}', entry, re.IGNORECASE | re.DOTALL)
-            if type_match:
-                entry_type = type_match.group(1).strip()
-                # Check if type is in the list of allowed types
-                if entry_type in types:
-                    filtered_entries.append(entry)
+        bound = _parse_number(value, clause)
+        compare = _COMPARISONS[operator]
+
+        def compare_number(entry):
+            number = read(entry)
+            return number is not None and compare(number, bound)
+        return compare_number
+
+    if operator not in ('=', '!='):
+        raise ValueError(f"{operator!r} needs a numeric field in clause {clause!r}")
+    values = frozenset(part.strip().lower() for part in value.split('|'))
+    negate = operator == '!='
+    if name == 'entrytype':
+        return lambda entry: (entry.entry_type in values) != negate
+    return lambda entry: (entry.text(name).lower() in values) != negate
+
+
+class EntryFilter:
+    """
+    A compiled conjunction of clauses.
+
+    Attributes:
+        clauses (list): The clause strings, in evaluation order.
+        reached (list): Entries that reached each clause.
+        passed (list): Entries that passed each clause.
+    """
+
+    def __init__(self, clauses):
+        self.clauses = list(clauses)
+        self._tests = [_compile_clause(clause) for clause in self.clauses]
+        self.reached = [0] * len(self.clauses)
+        self.passed = [0] * len(self.clauses)
+
+    def __call__(self, entry):
+        for i, test in enumerate(self._tests):
+            self.reached[i] += 1
+            if not test(entry):
+                return False
+            self.passed[i] += 1
+        return True
+
+    def print_selectivity(self, total):
+        print(f"{'clause':40} {'reached':>8} {'passed':>8} {'pass rate':>10}")
+        for clause, reached, passed in zip(self.clauses, self.reached, self.passed):
+            rate = f"{passed / reached:.1%}" if reached else '-'
+            print(f"{clause:40} {reached:>8} {passed:>8} {rate:>10}")
+        kept = self.passed[-1] if self.clauses else total
+        print(f"Kept {kept} of {total} entries")
+
+
+def filter_bibtex(input_file, output_file, entry_filter):
+    """
+    Streams the entries of ``input_file`` that pass ``entry_filter`` to ``output_file``.
+
+    Returns:
+        tuple: ``(read, written)`` entry counts.
+    """
+    read = written = 0
+    # The index decodes only the fields the clauses read, on demand.
+    with BibIndex(input_file) as index, open(output_file, 'wb') as f:
+        for entry in index:
+            read += 1
+            if entry_filter(entry):
+                if written:
+                    f.write(b'\n\n')
+                f.write(entry.raw)
+                written += 1
+        f.write(b'\n')
+    return read, written
+
+
+def filter_bibtex_type(input_file, output_file, types):
+    """Keeps the entries whose ``type`` field is one of ``types``."""
+    return filter_bibtex(input_file, output_file, EntryFilter(['type=' + '|'.join(types)]))
 
-    with open(output_file, 'w') as f:
-        f.write('\n'.join(filtered_entries))
 
 if __name__ == "__main__":
-    allowed_types = ["Article", "Conference paper", "Review"]
-    filter_bibtex_type("/Users/woodj/Desktop/congenial-potato/refs.bib", "/Users/woodj/Desktop/congenial-potato/filtered_by_type.bib", allowed_types)
+    parser = argparse.ArgumentParser(description="Filter a bib file by its fields.")
+    parser.add_argument('--input', default="/Users/woodj/Desktop/congenial-potato/refs.bib")
+    parser.add_argument('--output', default="/Users/woodj/Desktop/congenial-potato/filtered_by_type.bib")
+    parser.add_argument('--where', action='append', metavar='CLAUSE',
+                        help="a clause such as 'year=2020..' or 'has:abstract'; may be repeated")
+    args = parser.parse_args()
 
+    allowed_types = ["Article", "Conference paper", "Review"]
+    try:
+        entry_filter = EntryFilter(args.where or ['type=' + '|'.join(allowed_types)])
+    except ValueError as error:
+        parser.error(str(error))
+    read, written = filter_bibtex(args.input, args.output, entry_filter)
+    entry_filter.print_selectivity(read)
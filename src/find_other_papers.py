@@ -1,51 +1,22 @@
+import os
 
+from corpus import load_corpus
+from rule_engine import RULES_DIR, document_text, load_rules
 
-import re
+# Keyword rules, checked in order: the first match decides the category.
+APPLICATION_RULES = os.path.join(RULES_DIR, 'application_focus.json')
 
 def categorize_application_focus(abstract, title):
-    text = (abstract + ' ' + title).lower()
-    if any(keyword in text for keyword in ["aquaculture", "fish farming"]):
-        return 'Aquaculture & Farming'
-    if "plankton" in text:
-        return 'Plankton & Larval Analysis'
-    if any(keyword in text for keyword in ["fisheries assessment", "stock assessment"]):
-        return 'Fisheries Management & Stock Assessment'
-    if "remote sensing" in text:
-        return 'Remote Sensing'
-    if any(keyword in text for keyword in ["acoustic", "sonar"]):
-        return 'Underwater Acoustics'
-    if any(keyword in text for keyword in ["authenticity", "fraud"]):
-        return 'Food Science & Authenticity'
-    if "algal biomass" in text:
-        return 'Algal Biomass'
-    if "fisheries management" in text:
-        return 'Fisheries Management & Stock Assessment'
-    if any(keyword in text for keyword in ["species identification", "trait identification", "classification"]):
-        return 'Species & Trait Identification'
-    if any(keyword in text for keyword in ["ecology", "environmental monitoring", "water quality", "habitat"]):
-        return 'Ecology & Environmental Monitoring'
-    if any(keyword in text for keyword in ["genetics", "genomics", "dna"]):
-        return 'Genetics & Genomics'
-    return 'Other'
+    return load_rules(APPLICATION_RULES).categorize(document_text(abstract, title))['application']
 
-# --- Read and parse the bib file ---
-with open('/Users/woodj/Desktop/congenial-potato/refs.bib', 'r') as f:
-    content = f.read()
+if __name__ == "__main__":
+    # --- Read and parse the bib file ---
+    entries = load_corpus('/Users/woodj/Desktop/congenial-potato/refs.bib')
+    rules = load_rules(APPLICATION_RULES)
+    documents = [(entry.key, document_text(entry.get('abstract'), entry.get('title'))) for entry in entries]
 
-entries = content.split('\n@')
-
-for entry in entries:
-    if not entry.strip():
-        continue
-
-    title_match = re.search(r'title\s*=\s*{(.*?)}', entry, re.IGNORECASE | re.DOTALL)
-    title = title_match.group(1) if title_match else ""
-
-    abstract_match = re.search(r'abstract\s*=\s*{(.*?)}', entry, re.IGNORECASE | re.DOTALL)
-    abstract = abstract_match.group(1) if abstract_match else ""
-
-    category = categorize_application_focus(abstract, title)
-
-    if category == 'Other':
-        print(title)
+    for entry, labels in zip(entries, rules.categorize_batch(documents)):
+        if labels['application'] == 'Other':
+            print(entry.get('title'))
 
+    rules.print_report()
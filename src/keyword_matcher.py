@@ -0,0 +1,102 @@
+"""
+Single-pass multi-keyword matching.
+
+``KeywordMatcher`` finds every occurrence of a set of keywords in one scan
+of the text, instead of one ``keyword in text`` scan per keyword. The
+keywords are merged into a trie and the trie is compiled into a single
+regular expression, wrapped in a lookahead so a match is attempted at every
+position. Shared prefixes are tested once, so adding keywords barely slows
+the scan, and the scan itself runs inside the regex engine rather than in a
+Python loop.
+
+At each position the lookahead reports the longest keyword starting there;
+shorter keywords that are prefixes of it matched at the same position too,
+so they are looked up from a table built at compile time. Overlapping
+matches (a keyword starting inside another) are found because every
+position is tried.
+
+Keywords added with ``whole_word=True`` only match when not surrounded by
+letters, digits or underscores. Other keywords match anywhere, like ``in``.
+"""
+
+import re
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def _trie_pattern(node):
+    """Regex source for a trie node: {char: child} plus '' marking an end."""
+    branches = [re.escape(char) + _trie_pattern(child)
+                for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    # A keyword ending here makes the rest optional; '?' is greedy, so the
+    # longest keyword at a position wins.
+    return '(?:' + pattern + ')?' if '' in node else pattern
+
+
+class KeywordMatcher:
+    """
+    Args:
+        keywords (iterable): Keywords to match.
+        whole_word (bool): Default for ``add``.
+    """
+
+    def __init__(self, keywords=(), whole_word=False):
+        self._whole_word = {}
+        self._regex = None
+        self._prefixes = None
+        for keyword in keywords:
+            self.add(keyword, whole_word)
+
+    def __len__(self):
+        return len(self._whole_word)
+
+    def __contains__(self, keyword):
+        return keyword in self._whole_word
+
+    def add(self, keyword, whole_word=False):
+        if not keyword:
+            raise ValueError("Keywords must be non-empty")
+        self._whole_word[keyword] = whole_word
+        self._regex = None
+
+    def compile(self):
+        """Builds the scanner; called on first use after keywords change."""
+        trie = {}
+        for keyword in self._whole_word:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        self._regex = re.compile('(?=(' + _trie_pattern(trie) + '))')
+        self._prefixes = {
+            keyword: sorted((other for other in self._whole_word if keyword.startswith(other)), key=len)
+            for keyword in self._whole_word
+        }
+
+    def _bounded(self, text, start, end):
+        return ((start == 0 or not _is_word_char(text[start - 1]))
+                and (end == len(text) or not _is_word_char(text[end])))
+
+    def finditer(self, text):
+        """Yields ``(start, keyword)`` for every occurrence, in text order."""
+        if not self._whole_word:
+            return
+        if self._regex is None:
+            self.compile()
+        for match in self._regex.finditer(text):
+            start = match.start()
+            # The longest keyword here, plus every keyword that is a prefix of it.
+            for keyword in self._prefixes[match.group(1)]:
+                end = start + len(keyword)
+                if not self._whole_word[keyword] or self._bounded(text, start, end):
+                    yield start, keyword
+
+    def matches(self, text):
+        """The set of keywords occurring in ``text``."""
+        return {keyword for _, keyword in self.finditer(text)}
+
@@ -11,176 +11,165 @@ AND
  'acoustics' OR 'aquaculture')
  
 The search is performed on the paper's title, abstract, and keywords.
+
+Papers whose DOI or normalized title is already in refs.bib, and papers
+returned by an earlier query, are skipped; each query reports how many of
+its results were new (see query_planner.py).
+
+All queries are issued concurrently through SemanticScholarClient, which
+paces them with a token bucket and retries rate-limited (429) responses.
+Set S2_API_KEY to use an API key and its higher rate limit.
+
+With --harvest DIR, every query is paged through to the end instead and the
+papers are written to DIR/<query>.jsonl; re-running resumes from the
+checkpoints left next to those files.
+
+Responses are cached on disk (see response_cache.py), so re-running with an
+unchanged keyword set costs no API calls; --offline serves only from cache.
+--base-url points the client at another API root, such as a local
+s2_replay_server.py.
 """
 
-import requests
+import argparse
+import asyncio
 import json
-import time
-import urllib.parse # Import this to show the full URL
+import os
+import re
 
-def build_query_group(keywords):
+import requests
+
+from query_planner import LocalIndex, PaperFilter, estimate_overlap, expand_queries, print_plan
+from query_syntax import build_query_group, quote_keyword
+from response_cache import ResponseCache
+from semantic_scholar import API_ROOT, SemanticScholarClient, harvest, load_checkpoint
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_BIB = os.path.join(REPO_ROOT, 'refs.bib')
+DEFAULT_CACHE_DIR = os.path.join(REPO_ROOT, '.bibcache', 'http')
+
+def print_search_results(data, query_label="Query", seen_paper_ids=None, paper_filter=None):
     """
-    Creates an (A OR B OR C) string from a list of keywords.
-    Handles multi-word phrases with quotes.
+    Prints the papers in one /paper/search response.
+
+    Args:
+        data (dict): The decoded JSON response.
+        query_label (str): A label to print for this query.
+        seen_paper_ids (set): A set of paper IDs to filter out duplicates.
+                               If None, duplicates won't be tracked.
+        paper_filter (PaperFilter): If given, also skips papers already in
+                                    the local bib and counts new vs. known.
     """
-    quoted_keywords = []
-    for k in keywords:
-        # If a keyword contains a space, wrap it in quotes for an exact phrase match
-        if ' ' in k:
-            quoted_keywords.append(f'"{k}"')
-        else:
-            quoted_keywords.append(k)
-    
-    return f"({' OR '.join(quoted_keywords)})"
+    # --- DEBUG: Print the raw JSON response (or part of it) ---
+    # This shows us exactly what the API returned
+    print("DEBUG: API Response (snippet):")
+    print(json.dumps(data, indent=2,
+                     ensure_ascii=False)[:1000] + "...\n")
+    # --- End DEBUG ---
+
+    total_results = data.get('total', 0)
+    if total_results == 0:
+        print("No papers found matching your criteria for this query.")
+        return
+
+    print(f"Found {total_results} total matching papers for this query.")
+    print("--------------------------------------------------\n")
+
+    papers_found_in_this_query = 0
+    for i, paper in enumerate(data.get('data', [])):
+        paper_id = paper.get('paperId')
+
+        outcome = paper_filter.classify(paper, query_label) if paper_filter is not None else None
+
+        # De-duplication check
+        if outcome == 'duplicate' or (seen_paper_ids is not None and paper_id in seen_paper_ids):
+            print(f"--- Skipping duplicate paper (ID: {paper_id}) ---")
+            continue
 
-def quote_keyword(keyword):
-    """Helper function to quote a single keyword if it has a space."""
-    if ' ' in keyword:
-        return f'"{keyword}"'
-    return keyword
+        if outcome == 'known':
+            print(f"--- Skipping paper already in the bib (ID: {paper_id}) ---")
+            continue
 
-def search_semantic_scholar(query_string, limit=20, query_label="Query", seen_paper_ids=None):
+        if seen_paper_ids is not None and paper_id:
+            seen_paper_ids.add(paper_id)
+
+        papers_found_in_this_query += 1
+        print(f"--- Result {i + 1} (Query: {query_label}) ---")
+
+        title = paper.get('title', 'N/A')
+        year = paper.get('year', 'N/A')
+        url = paper.get('url', 'N/A')
+
+        # Authors is a list of dicts, extract the 'name' field
+        authors = [author['name'] for author in paper.get('authors', [])]
+        author_str = ", ".join(authors) if authors else "N/A"
+
+        # Keywords is a list of dicts, extract the 'keyword' field
+        keywords_list = [kw['keyword'] for kw in paper.get('keywords') or [] if kw]
+        keyword_str = ", ".join(keywords_list) if keywords_list else "N/A"
+
+        # Get a snippet of the abstract
+        abstract = paper.get('abstract')
+        abstract_snippet = (abstract[:300] + '...') if abstract else 'N/A'
+
+        print(f"Title:    {title}")
+        print(f"Year:     {year}")
+        print(f"Authors:  {author_str}")
+        print(f"Keywords: {keyword_str}")
+        print(f"URL:      {url}")
+        print(f"Abstract: {abstract_snippet}\n")
+
+    if papers_found_in_this_query == 0 and total_results > 0:
+        print("All results for this query were duplicates of previous queries.")
+
+def report_search_error(err):
+    """Prints a search failure the way the old blocking client did."""
+    if isinstance(err, requests.exceptions.HTTPError):
+        print(f"HTTP error occurred: {err}")
+        if err.response is not None and err.response.status_code == 429:
+            print("ERROR: You are still being rate-limited after retrying. Get a free API key from")
+            print("https://www.semanticscholar.org/product/api and set the S2_API_KEY variable.")
+    elif isinstance(err, json.JSONDecodeError):
+        print("Failed to decode the response from the server.")
+    else:
+        print(f"An error occurred: {err}")
+
+def print_query_result(query_string, query_label, result, limit, seen_paper_ids=None, client=None,
+                       paper_filter=None):
+    print(f"\n--- Running: {query_label} ---")
+    print(f"Constructed Query: {query_string}\n")
+    if client is not None:
+        debug_url = client.build_url('paper/search', {'query': query_string, 'limit': limit})
+        print(f"DEBUG: Requested URL:\n{debug_url}\n")
+    print(f"Semantic Scholar results (showing top {limit} results)")
+
+    if isinstance(result, Exception):
+        report_search_error(result)
+    else:
+        print_search_results(result, query_label, seen_paper_ids, paper_filter)
+
+def search_semantic_scholar(query_string, limit=20, query_label="Query", seen_paper_ids=None, client=None):
     """
     Performs a search on the Semantic Scholar API given a query string.
-    
+
     Args:
         query_string (str): The search query.
         limit (int): Max results for this query.
         query_label (str): A label to print for this query.
         seen_paper_ids (set): A set of paper IDs to filter out duplicates.
                                If None, duplicates won't be tracked.
+        client (SemanticScholarClient): Client to use; a new one by default.
     """
-    
-    print(f"\n--- Running: {query_label} ---")
-    print(f"Constructed Query: {query_string}\n")
-    
-    # 2. Set up the API call
-    base_url = "https://api.semanticscholar.org/graph/v1/paper/search"
-    
-    # Define the parameters
-    # ** FIX: Manually encode the query string to use %20 for spaces, not + **
-    # The API is strict and returns 400 if spaces are encoded as '+'
+    own_client = client is None
+    client = client or SemanticScholarClient()
     try:
-        encoded_query = urllib.parse.quote(query_string)
-    except Exception as e:
-        print(f"Error encoding query string: {e}")
-        return
-
-    # Pass other params normally
-    other_params = {
-        'limit': limit,
-        'fields': 'title,abstract,year,authors.name,url,keywords,paperId' # Added paperId
-    }
-    
-    # Build the full URL with the correctly encoded query
-    # requests will handle encoding the *other* params
-    full_url = f"{base_url}?query={encoded_query}"
-
-    # Semantic Scholar API is public but recommends an API key for
-    # higher rate limits. For simple scripts, it often works without one.
-    # If you get rate-limited (HTTP 429), get a free key at:
-    # https://www.semanticscholar.org/product/api
-    # headers = {'x-api-key': 'YOUR_API_KEY_HERE'}
-
-    # --- DEBUG: Show the exact URL being requested ---
-    # We now build the debug URL slightly differently
-    debug_url = f"{full_url}&{urllib.parse.urlencode(other_params)}"
-    print(f"DEBUG: Requesting URL:\n{debug_url}\n")
-    # --- End DEBUG ---
-    
-    print(f"Querying Semantic Scholar API... (showing top {limit} results)")
-
-    # 3. Make the request
-    try:
-        # ** FIX: Add a short sleep to avoid 429 rate-limiting **
-        print("Waiting 2 seconds to be polite to the API...")
-        time.sleep(2)
-        
-        # response = requests.get(full_url, params=other_params, headers=headers) # Use this if you have an API key
-        response = requests.get(full_url, params=other_params)
-        
-        # Print status code for debugging, even if it's 200
-        print(f"DEBUG: Received HTTP Status Code: {response.status_code}")
-
-        # Raise an exception for bad status codes (like 404, 500)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # --- DEBUG: Print the raw JSON response (or part of it) ---
-        # This shows us exactly what the API returned
-        # Use json.dumps for pretty printing
-        print("DEBUG: API Response (snippet):")
-        print(json.dumps(data, indent=2,
-                         ensure_ascii=False)[:1000] + "...\n")
-        # --- End DEBUG ---
-        
-        total_results = data.get('total', 0)
-        if total_results == 0:
-            print("No papers found matching your criteria for this query.")
-            return
-
-        print(f"Found {total_results} total matching papers for this query.")
-        print("--------------------------------------------------\n")
-        
-        # 4. Parse and print results
-        papers_found_in_this_query = 0
-        for i, paper in enumerate(data.get('data', [])):
-            paper_id = paper.get('paperId')
-            
-            # De-duplication check
-            if seen_paper_ids is not None and paper_id in seen_paper_ids:
-                print(f"--- Skipping duplicate paper (ID: {paper_id}) ---")
-                continue
-            
-            if seen_paper_ids is not None and paper_id:
-                seen_paper_ids.add(paper_id)
-            
-            papers_found_in_this_query += 1
-            print(f"--- Result {i + 1} (Query: {query_label}) ---")
-            
-            title = paper.get('title', 'N/A')
-            year = paper.get('year', 'N/A')
-            url = paper.get('url', 'N/A')
-            
-            # Authors is a list of dicts, extract the 'name' field
-            authors = [author['name'] for author in paper.get('authors', [])]
-            author_str = ", ".join(authors) if authors else "N/A"
-            
-            # Keywords is a list of dicts, extract the 'keyword' field
-            keywords_list = [kw['keyword'] for kw in paper.get('keywords', []) if kw]
-            keyword_str = ", ".join(keywords_list) if keywords_list else "N/A"
-
-            # Get a snippet of the abstract
-            abstract = paper.get('abstract')
-            abstract_snippet = (abstract[:300] + '...') if abstract else 'N/A'
-            
-            print(f"Title:    {title}")
-            print(f"Year:     {year}")
-            print(f"Authors:  {author_str}")
-            print(f"Keywords: {keyword_str}")
-            print(f"URL:      {url}")
-            print(f"Abstract: {abstract_snippet}\n")
-            
-            # Be polite to the API and don't spam requests
-            time.sleep(0.5) 
-        
-        if papers_found_in_this_query == 0 and total_results > 0:
-            print("All results for this query were duplicates of previous queries.")
-
-    except requests.exceptions.HTTPError as http_err:
-        print(f"HTTP error occurred: {http_err}")
-        # Check if response is available to check status_code
-        if hasattr(response, 'status_code') and response.status_code == 429:
-            print("ERROR: You are being rate-limited. Please get a free API key from")
-            print("https://www.semanticscholar.org/product/api and add it to the 'headers' variable.")
-    except requests.exceptions.RequestException as err:
-        print(f"An error occurred: {err}")
-    except json.JSONDecodeError:
-        print("Failed to decode the response from the server.")
-        print(f"Response text: {response.text}")
+        result = asyncio.run(client.search_many([query_string], limit=limit))[0]
+    finally:
+        if own_client:
+            client.close()
+    print_query_result(query_string, query_label, result, limit, seen_paper_ids, client)
 
-def main():
+def build_queries():
+    """Returns the (query, label) pairs searched by main()."""
     # Define your keyword sets
     ml_keywords = {'machine learning', 'deep learning', 'artificial intelligence'}
     marine_keywords = {
@@ -192,37 +181,127 @@ def main():
         'aquaculture'
     }
     
-    # --- Build Queries ---
-    query_group1 = build_query_group(ml_keywords)
-    
+    # Loop through marine keywords and run one query for each,
+    # e.g. (ML_Group) AND "marine biomass". This avoids the complex
+    # (A OR B) AND (C OR D OR E) query that returned 0.
+    queries = expand_queries(ml_keywords, marine_keywords)
+
+    return queries
+
+def harvested_ids(output_dir):
+    """
+    Paper ids already written to the JSONL files in ``output_dir``.
+
+    Only the checkpointed part of each file is read, since a resumed harvest
+    truncates anything written after its last checkpoint.
+    """
+    ids = set()
+    for name in os.listdir(output_dir):
+        if not name.endswith('.jsonl'):
+            continue
+        sink_path = os.path.join(output_dir, name)
+        checkpoint = load_checkpoint(sink_path + '.checkpoint') or {}
+        with open(sink_path, 'rb') as f:
+            data = f.read(checkpoint.get('sink_bytes', 0))
+        ids.update(json.loads(line).get('paperId') for line in data.splitlines() if line.strip())
+    ids.discard(None)
+    return ids
+
+async def harvest_queries(queries, output_dir, mode='bulk', max_papers=None, client=None,
+                          paper_filter=None):
+    """
+    Harvests the full result set of every query into ``output_dir``.
+
+    With a ``paper_filter``, only papers that are new (not in the local bib
+    and not written by another query) are kept.
+
+    Returns a list of final checkpoints, one per query.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    own_client = client is None
+    client = client or SemanticScholarClient()
+    tasks = []
+    for query, label in queries:
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_').lower()
+        sink_path = os.path.join(output_dir, f"{slug}.jsonl")
+        keep = paper_filter.for_query(label) if paper_filter is not None else None
+        tasks.append(harvest(client, query, sink_path, mode=mode, max_papers=max_papers,
+                             paper_filter=keep))
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        if own_client:
+            client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--harvest', metavar='DIR',
+                        help="page through all results and write them to DIR as JSONL")
+    parser.add_argument('--mode', choices=['bulk', 'relevance'], default='bulk',
+                        help="harvest paging mode (default: bulk)")
+    parser.add_argument('--max-papers', type=int, help="stop each harvest after this many papers")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="response cache directory")
+    parser.add_argument('--cache-ttl', type=float, default=7 * 24,
+                        help="hours a cached response stays fresh (default: 168)")
+    parser.add_argument('--cache-size', type=int, default=256,
+                        help="cache size budget in MiB (default: 256)")
+    parser.add_argument('--no-cache', action='store_true', help="always query the API")
+    parser.add_argument('--offline', action='store_true', help="serve only from the response cache")
+    parser.add_argument('--bib', default=DEFAULT_BIB,
+                        help="local bibliography whose papers are skipped (default: refs.bib)")
+    parser.add_argument('--base-url', default=API_ROOT, help="API root, e.g. a local stand-in server")
+    args = parser.parse_args()
+
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(args.cache_dir, ttl=args.cache_ttl * 3600,
+                              max_bytes=args.cache_size << 20, offline=args.offline)
+    client = SemanticScholarClient(base_url=args.base_url, cache=cache)
+
+    queries = build_queries()
+    local_index = LocalIndex.from_bib(args.bib) if os.path.exists(args.bib) else LocalIndex()
+
+    if args.harvest:
+        print(f"Harvesting {len(queries)} queries into {args.harvest}")
+        os.makedirs(args.harvest, exist_ok=True)
+        paper_filter = PaperFilter(local_index, harvested_ids(args.harvest))
+        checkpoints = asyncio.run(harvest_queries(queries, args.harvest, args.mode, args.max_papers,
+                                                  client, paper_filter))
+        client.close()
+        for (_, label), checkpoint in zip(queries, checkpoints):
+            status = "complete" if checkpoint['done'] else "partial"
+            print(f"{label}: {checkpoint['harvested']} of {checkpoint['total']} papers fetched, "
+                  f"{checkpoint['written']} new written ({status})")
+        paper_filter.report()
+        return
+
+    limit = 10  # Request 10 for each keyword
+
+    # Run the queries expected to contribute the most new papers first.
+    if cache is not None:
+        plan = estimate_overlap(queries, cache, limit)
+        print_plan(plan)
+        queries = [(query, label) for query, label, _, _ in plan]
+
     # This set will store paperId strings to avoid printing duplicates
     seen_paper_ids = set()
-    
-    # --- Run Searches ---
-    # New Strategy: Loop through marine keywords and run one query for each.
-    # This avoids the complex (A OR B) AND (C OR D OR E) query that returned 0.
-    
-    print(f"Starting multi-query search. Will run {len(marine_keywords)} separate queries.")
-    
-    for marine_kw in marine_keywords:
-        # Build a simpler query
-        # e.g., (ML_Group) AND "fish"
-        # e.g., (ML_Group) AND "marine biomass"
-        quoted_marine_kw = quote_keyword(marine_kw)
-        
-        complex_query = f"{query_group1} AND {quoted_marine_kw}"
-        
-        # Run the search for this specific keyword
-        search_semantic_scholar(
-            complex_query, 
-            limit=10,  # Request 10 for each keyword
-            query_label=f"ML AND {quoted_marine_kw}",
-            seen_paper_ids=seen_paper_ids
-        )
-    
+    paper_filter = PaperFilter(local_index)
+
+    print(f"Starting multi-query search. Will run {len(queries)} separate queries.")
+
+    # The queries run concurrently; the client keeps them within the rate limit.
+    results = asyncio.run(client.search_many([query for query, _ in queries], limit=limit))
+    client.close()
+
+    for (query, label), result in zip(queries, results):
+        print_query_result(query, label, result, limit, seen_paper_ids, client, paper_filter)
+
     print(f"\n--- Search complete. Found {len(seen_paper_ids)} unique papers. ---")
+    paper_filter.report()
+    print(f"API calls: {client.stats['requests']} ({client.stats['retries']} retried), "
+          f"cache hits: {client.stats['cache_hits']}")
 
 
 if __name__ == "__main__":
     main()
-
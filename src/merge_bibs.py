@@ -0,0 +1,226 @@
+"""
+Merges several bib exports (Scopus, Web of Science, hand-written) into one file.
+
+Inputs are streamed and never loaded whole:
+
+  1. Every entry of every input is reduced to a small record: its canonical
+     key (normalized title), input number, byte span, citation key and
+     DOI. Records are sorted in runs of RUN_SIZE and spilled to
+     temporary files, so memory is bounded by the run size.
+  2. The runs are k-way merged with ``heapq.merge``. Records with the same
+     canonical key arrive together; the entry from the earliest input (then
+     earliest in that file) is kept and the others are recorded as its
+     other sources. A copy without a DOI (or with an arXiv preprint DOI)
+     merges with one that has it; only copies with conflicting DOIs are
+     kept as separate entries.
+  3. The kept entries are copied, byte for byte, from the inputs to the
+     output in that single pass. A citation key already used by a different
+     paper gets a letter suffix (Huang2023 -> Huang2023a).
+
+``@string`` definitions of all inputs are written at the top of the output.
+Only the set of citation keys written so far is held for the whole run.
+
+Next to the output, ``<output>.provenance.jsonl`` has one line per written
+entry: its citation key, its key in the input it came from, and the input,
+byte offset and key of every copy that was merged into it.
+
+Usage:
+    python merge_bibs.py scopus.bib wos.bib manual.bib --output refs.bib
+"""
+
+import argparse
+import heapq
+import json
+import os
+import re
+import string
+import tempfile
+
+from bibtex import iter_raw_entries, normalize_doi, normalize_title, parse_entry
+
+RUN_SIZE = 100000
+
+_KEY_HEAD = re.compile(rb'(\s*@\s*[A-Za-z][\w-]*\s*[{(]\s*)([^,\s]*)')
+_STRING_HEAD = re.compile(rb'\s*@\s*string\s*[{(]', re.IGNORECASE)
+
+# DOIs arXiv assigns to preprints; they never conflict with the published DOI.
+_PREPRINT_DOI = '10.48550/arxiv.'
+
+
+def canonical_key(entry):
+    """
+    Identity of the paper behind an entry, shared by its copies in other exports.
+
+    This is the normalized title with the spaces removed too, so that
+    "Taiwan's" and "Taiwan’s" (normalized to "taiwan s" and "taiwans")
+    agree. Entries without a title fall back to their DOI.
+    """
+    title = ''.join(normalize_title(entry.title).split())
+    if title:
+        return 'title:' + title
+    doi = normalize_doi(entry.text('doi'))
+    if doi:
+        return 'doi:' + doi
+    return None
+
+
+def _records(path, file_number, strings):
+    """Yields ``(canonical key, file number, start, end, citation key, doi)`` for an input."""
+    macros = {}
+    for start, data in iter_raw_entries(path):
+        if _STRING_HEAD.match(data):
+            strings.setdefault(data.strip(), None)
+        entry = parse_entry(data, macros=macros)
+        if entry is None:
+            continue
+        # Entries without a DOI or title are never merged with anything.
+        key = canonical_key(entry) or f'entry:{file_number}:{start}'
+        doi = normalize_doi(entry.text('doi'))
+        if doi.startswith(_PREPRINT_DOI):
+            doi = ''
+        yield key, file_number, start, start + len(data), entry.key, doi
+
+
+def _write_run(records, directory):
+    records.sort()
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.run', delete=False,
+                                     encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    return f.name
+
+
+def _read_run(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield tuple(json.loads(line))
+
+
+def sorted_records(paths, run_size=RUN_SIZE, directory=None):
+    """
+    Records of all inputs in canonical key order, and the ``@string`` definitions.
+
+    Returns:
+        tuple: ``(records, strings, run_paths)``; ``records`` is an iterator
+               over the merged runs, whose files the caller removes.
+    """
+    strings = {}
+    run_paths = []
+    run = []
+    for file_number, path in enumerate(paths):
+        for record in _records(path, file_number, strings):
+            run.append(record)
+            if len(run) >= run_size:
+                run_paths.append(_write_run(run, directory))
+                run = []
+    if not run_paths:
+        run.sort()
+        return iter(run), list(strings), run_paths
+    if run:
+        run_paths.append(_write_run(run, directory))
+    return heapq.merge(*(_read_run(path) for path in run_paths)), list(strings), run_paths
+
+
+def _free_key(key, used):
+    if key not in used:
+        return key
+    for suffix in string.ascii_lowercase:
+        if key + suffix not in used:
+            return key + suffix
+    number = 2
+    while f'{key}_{number}' in used:
+        number += 1
+    return f'{key}_{number}'
+
+
+def _with_key(data, key):
+    """Entry source bytes with the citation key replaced."""
+    return _KEY_HEAD.sub(lambda m: m.group(1) + key.encode('utf-8'), data, count=1)
+
+
+def merge_bib_files(paths, output_path, run_size=RUN_SIZE):
+    """
+    Merges bib files into ``output_path``; earlier inputs win when a paper is in several.
+
+    Returns:
+        dict: ``{'read': records read, 'written': entries written,
+                 'merged': copies dropped, 'renamed': keys changed}``.
+    """
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    records, strings, run_paths = sorted_records(paths, run_size, output_dir)
+    files = [open(path, 'rb') for path in paths]
+    used = set()
+    stats = {'read': 0, 'written': 0, 'merged': 0, 'renamed': 0}
+
+    def split(group):
+        # Copies of one title are one paper unless their DOIs disagree.
+        papers = []
+        dois = []
+        for record in group:
+            doi = record[5]
+            for i, paper in enumerate(papers):
+                if not doi or not dois[i] or doi == dois[i]:
+                    paper.append(record)
+                    dois[i] = dois[i] or doi
+                    break
+            else:
+                papers.append([record])
+                dois.append(doi)
+        return papers
+
+    def flush(group, out, provenance):
+        _, file_number, start, end, key, _ = group[0]
+        new_key = _free_key(key, used)
+        used.add(new_key)
+        files[file_number].seek(start)
+        data = files[file_number].read(end - start).strip()
+        if new_key != key:
+            data = _with_key(data, new_key)
+            stats['renamed'] += 1
+        out.write(data + b'\n\n')
+        provenance.write(json.dumps({
+            'key': new_key, 'original_key': key,
+            'sources': [{'file': paths[f], 'offset': s, 'key': k} for _, f, s, _, k, _ in group]}) + '\n')
+        stats['written'] += 1
+        stats['merged'] += len(group) - 1
+
+    tmp_path = output_path + '.tmp'
+    provenance_path = output_path + '.provenance.jsonl'
+    try:
+        with open(tmp_path, 'wb') as out, open(provenance_path + '.tmp', 'w', encoding='utf-8') as provenance:
+            for definition in strings:
+                out.write(definition + b'\n\n')
+            group = []
+            for record in records:
+                stats['read'] += 1
+                if group and record[0] != group[0][0]:
+                    for paper in split(group):
+                        flush(paper, out, provenance)
+                    group = []
+                group.append(record)
+            for paper in split(group):
+                flush(paper, out, provenance)
+        os.replace(tmp_path, output_path)
+        os.replace(provenance_path + '.tmp', provenance_path)
+    finally:
+        for f in files:
+            f.close()
+        for path in run_paths:
+            os.remove(path)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge bib exports into one file.")
+    parser.add_argument('inputs', nargs='+', help="bib files, highest priority first")
+    parser.add_argument('--output', default='/Users/woodj/Desktop/congenial-potato/refs.bib')
+    parser.add_argument('--run-size', type=int, default=RUN_SIZE,
+                        help="entries sorted in memory at a time")
+    args = parser.parse_args()
+
+    if os.path.abspath(args.output) in {os.path.abspath(path) for path in args.inputs}:
+        parser.error("the output must not be one of the inputs")
+    stats = merge_bib_files(args.inputs, args.output, args.run_size)
+    print(f"Read {stats['read']} entries, wrote {stats['written']} to {args.output} "
+          f"({stats['merged']} duplicates merged, {stats['renamed']} keys renamed)")
+    print(f"Provenance saved to {args.output}.provenance.jsonl")
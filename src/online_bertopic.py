@@ -0,0 +1,231 @@
+"""
+Incremental BERTopic: new papers update the model instead of refitting it.
+
+The model uses BERTopic's online-capable components:
+
+  - IncrementalPCA instead of UMAP for dimensionality reduction,
+  - MiniBatchKMeans instead of HDBSCAN for clustering, and
+  - OnlineCountVectorizer (with decay) for the topic representations,
+
+so ``BERTopic.partial_fit`` can absorb a batch of papers at a time. The
+first run trains on the whole corpus in batches; later runs only look at
+abstracts that have not been seen before. Embeddings come from the
+embedding store (embedding_store.py), so nothing is re-encoded.
+
+``partial_fit`` needs at least MIN_BATCH documents. Smaller sets of new
+papers are assigned to the existing topics with ``transform`` and queued;
+they are trained on once the queue is large enough.
+
+Topics drift as batches arrive, and k-means keeps a fixed number of
+clusters, so clusters can end up describing the same theme. Every
+MERGE_EVERY training batches, topics whose embedding centroids have a
+cosine similarity of at least MERGE_SIMILARITY are merged in the report.
+The merges are kept in the state file rather than rewritten into the
+model, so they need none of the old documents. Memory per run is bounded
+by the batch size plus one centroid per cluster.
+"""
+
+import json
+import os
+import pickle
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import IncrementalPCA
+
+from corpus import cache_dir
+from embedding_store import EMBEDDING_MODEL, EmbeddingStore, embedding_cache_dir, text_digest
+
+ONLINE_CLUSTERS = 20
+REDUCED_DIMENSIONS = 5
+BATCH_SIZE = 256
+MIN_BATCH = 10
+MERGE_EVERY = 4
+MERGE_SIMILARITY = 0.9
+
+
+def online_model_dir(bib_path):
+    path = os.path.join(cache_dir(bib_path), 'bertopic_online')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def build_online_model(n_clusters=ONLINE_CLUSTERS, n_components=REDUCED_DIMENSIONS):
+    from bertopic import BERTopic
+    from bertopic.vectorizers import OnlineCountVectorizer
+
+    return BERTopic(embedding_model=EMBEDDING_MODEL,
+                    umap_model=IncrementalPCA(n_components=n_components),
+                    hdbscan_model=MiniBatchKMeans(n_clusters=n_clusters, random_state=0, n_init=3),
+                    vectorizer_model=OnlineCountVectorizer(stop_words="english", decay=.01),
+                    verbose=True)
+
+
+class OnlineState:
+    """
+    What the incremental model has seen, plus per-topic embedding centroids.
+
+    Attributes:
+        seen (set): Digests of abstracts trained on or queued.
+        pending (dict): ``{digest: abstract}`` queued for the next training batch.
+        sums (dict): ``{topic: summed embedding}`` of the assigned abstracts.
+        counts (dict): ``{topic: number of abstracts}``.
+        merges (dict): ``{topic: topic it was merged into}``.
+        batches (int): Training batches so far.
+    """
+
+    def __init__(self):
+        self.seen = set()
+        self.pending = {}
+        self.sums = {}
+        self.counts = {}
+        self.merges = {}
+        self.batches = 0
+
+    @classmethod
+    def load(cls, directory):
+        state = cls()
+        try:
+            with open(os.path.join(directory, 'state.json'), 'r') as f:
+                stored = json.load(f)
+            with np.load(os.path.join(directory, 'centroids.npz')) as centroids:
+                for topic, total, count in zip(centroids['topics'], centroids['sums'], centroids['counts']):
+                    state.sums[int(topic)] = total
+                    state.counts[int(topic)] = int(count)
+        except (OSError, ValueError):
+            return cls()
+        state.seen = set(stored['seen'])
+        state.pending = stored['pending']
+        state.merges = {int(topic): target for topic, target in stored['merges'].items()}
+        state.batches = stored['batches']
+        return state
+
+    def save(self, directory):
+        topics = sorted(self.sums)
+        dim = len(next(iter(self.sums.values()))) if self.sums else 0
+        np.savez(os.path.join(directory, 'centroids.npz'), topics=np.array(topics, dtype=np.int64),
+                 sums=np.array([self.sums[t] for t in topics], dtype=np.float64).reshape(len(topics), dim),
+                 counts=np.array([self.counts[t] for t in topics], dtype=np.int64))
+        tmp_path = os.path.join(directory, 'state.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'seen': sorted(self.seen), 'pending': self.pending,
+                       'merges': self.merges, 'batches': self.batches}, f)
+        os.replace(tmp_path, os.path.join(directory, 'state.json'))
+
+    def add(self, topics, embeddings):
+        for topic, vector in zip(topics, embeddings):
+            topic = int(topic)
+            self.sums[topic] = self.sums.get(topic, 0) + vector.astype(np.float64)
+            self.counts[topic] = self.counts.get(topic, 0) + 1
+
+    def canonical(self, topic):
+        while topic in self.merges:
+            topic = self.merges[topic]
+        return topic
+
+    def merge_similar(self, threshold=MERGE_SIMILARITY):
+        """Merges topics whose centroids are at least ``threshold`` cosine-similar."""
+        groups = {}
+        for topic in self.sums:
+            groups.setdefault(self.canonical(topic), []).append(topic)
+        roots = sorted(groups)
+        if len(roots) < 2:
+            return []
+        centroids = np.array([sum(self.sums[t] for t in groups[root]) /
+                              sum(self.counts[t] for t in groups[root]) for root in roots])
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+        similarity = centroids @ centroids.T
+        merged = []
+        for i, j in zip(*np.nonzero(np.triu(similarity, 1) >= threshold)):
+            a, b = self.canonical(roots[i]), self.canonical(roots[j])
+            if a != b:
+                self.merges[max(a, b)] = min(a, b)
+                merged.append((max(a, b), min(a, b)))
+        return merged
+
+
+def _batches(items, size, minimum):
+    """Chunks of ``size``; a short tail is folded into the chunk before it."""
+    chunks = [items[start:start + size] for start in range(0, len(items), size)]
+    if len(chunks) > 1 and len(chunks[-1]) < minimum:
+        chunks[-2].extend(chunks.pop())
+    return chunks
+
+
+def update_online_topics(bib_path, abstracts, batch_size=BATCH_SIZE, n_clusters=ONLINE_CLUSTERS):
+    """
+    Brings the incremental BERTopic model of a bib file up to date.
+
+    Returns:
+        tuple: ``(model, state, trained, assigned)``: the model, its state,
+               and how many abstracts were trained on or only assigned.
+    """
+    directory = online_model_dir(bib_path)
+    model_path = os.path.join(directory, 'model.pickle')
+    try:
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+        state = OnlineState.load(directory)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        model, state = None, OnlineState()
+
+    new = {}
+    for abstract in abstracts:
+        digest = text_digest(abstract)
+        if digest not in state.seen:
+            new[digest] = abstract
+    state.seen.update(new)
+    state.pending.update(new)
+
+    store = EmbeddingStore(embedding_cache_dir(bib_path), EMBEDDING_MODEL)
+    minimum = n_clusters if model is None else MIN_BATCH
+    trained = assigned = 0
+
+    if len(state.pending) >= minimum:
+        if model is None:
+            model = build_online_model(n_clusters)
+        texts = list(state.pending.values())
+        for batch in _batches(texts, max(batch_size, minimum), minimum):
+            # float64 throughout: the k-means centres keep the dtype of the first batch.
+            embeddings = store.embed(batch).astype(np.float64)
+            model.partial_fit(batch, embeddings=embeddings)
+            topics, _ = model.transform(batch, embeddings=embeddings)
+            state.add(topics, embeddings)
+            state.batches += 1
+            trained += len(batch)
+            if state.batches % MERGE_EVERY == 0:
+                for topic, target in state.merge_similar():
+                    print(f"Merged topic {topic} into topic {target}")
+        state.pending = {}
+    elif model is not None and new:
+        # Too few to train on: assign them now, train on them later.
+        texts = list(new.values())
+        topics, _ = model.transform(texts, embeddings=store.embed(texts).astype(np.float64))
+        for text, topic in zip(texts, topics):
+            print(f"Topic {state.canonical(int(topic))}: {text[:80]}...")
+        assigned = len(texts)
+
+    if model is not None:
+        tmp_path = model_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, model_path)
+    state.save(directory)
+    return model, state, trained, assigned
+
+
+def print_online_topics(model, state, num_words=10):
+    groups = {}
+    for topic in state.counts:
+        groups.setdefault(state.canonical(topic), []).append(topic)
+    for root in sorted(groups, key=lambda root: -sum(state.counts[t] for t in groups[root])):
+        members = sorted(groups[root])
+        size = sum(state.counts[t] for t in members)
+        scores = {}
+        for topic in members:
+            for word, score in model.get_topic(topic) or []:
+                scores[word] = scores.get(word, 0) + score
+        words = sorted(scores, key=scores.get, reverse=True)[:num_words]
+        label = f"Topic {root}" + (f" (merged {', '.join(map(str, members[1:]))})" if len(members) > 1 else "")
+        print(f"{label}: {size} papers")
+        print(f"  Representation: {words}")
@@ -0,0 +1,144 @@
+"""
+Online LDA that absorbs new papers without refitting.
+
+The first run fits the vocabulary once (via the shared document-term matrix
+stage in features.py) and trains ``LatentDirichletAllocation`` with
+``learning_method='online'``, making several passes over mini-batches of the
+corpus. The model, its frozen vocabulary and a snapshot of the entry
+digests it has seen are saved under ``.bibcache/``.
+
+Later runs load the model, ask ``corpus.diff_corpus`` which entries were
+added or changed since the snapshot, and ``partial_fit`` only those, so a
+weekly batch of new papers costs time proportional to the batch. The
+vocabulary stays frozen so topic-word columns keep their meaning: terms
+that first appear in new papers are ignored until the model is rebuilt
+(``rebuild=True``). Removed entries cannot be unlearned and simply stop
+contributing.
+"""
+
+import os
+import pickle
+
+from sklearn.decomposition import LatentDirichletAllocation
+from sklearn.feature_extraction.text import CountVectorizer
+
+from corpus import cache_dir, diff_corpus, load_corpus, load_snapshot, save_snapshot, snapshot_path
+from features import VECTORIZER_PARAMS, document_term_matrix, dtm_cache_dir
+
+MODEL_VERSION = 1
+BATCH_SIZE = 64
+
+
+class OnlineTopicModel:
+    """
+    An online LDA model over a frozen vocabulary.
+
+    Args:
+        vocabulary (list): Terms, in column order.
+        num_topics (int): Number of LDA topics.
+        params (dict): Vectorizer parameters the vocabulary was built with;
+                       the document-frequency cut-offs are not reapplied.
+        random_state (int): Seed for the LDA model.
+    """
+
+    def __init__(self, vocabulary, num_topics=5, params=None, random_state=0):
+        params = {name: value for name, value in (params or VECTORIZER_PARAMS).items()
+                  if name not in ('max_df', 'min_df')}
+        self.vectorizer = CountVectorizer(vocabulary=list(vocabulary), **params)
+        self.lda = LatentDirichletAllocation(n_components=num_topics, learning_method='online',
+                                             random_state=random_state)
+        self.documents = 0
+
+    @property
+    def vocabulary(self):
+        return self.vectorizer.get_feature_names_out()
+
+    def fit_matrix(self, matrix, batch_size=BATCH_SIZE):
+        """Initial training: several online passes over a whole corpus."""
+        self.lda.set_params(batch_size=batch_size, total_samples=matrix.shape[0])
+        self.lda.fit(matrix)
+        self.documents = matrix.shape[0]
+
+    def partial_fit_matrix(self, matrix, corpus_size=None, batch_size=BATCH_SIZE):
+        """
+        Trains on the rows of a document-term matrix, ``batch_size`` at a time.
+
+        ``corpus_size`` is the number of documents the model stands for; it
+        weighs each mini-batch against the rest of the corpus.
+        """
+        self.lda.total_samples = corpus_size or max(self.documents + matrix.shape[0], 1)
+        for start in range(0, matrix.shape[0], batch_size):
+            batch = matrix[start:start + batch_size]
+            self.lda.partial_fit(batch)
+            self.documents += batch.shape[0]
+
+    def update(self, texts, corpus_size=None, batch_size=BATCH_SIZE):
+        """Trains on new document texts, vectorized with the frozen vocabulary."""
+        if texts:
+            self.partial_fit_matrix(self.vectorizer.transform(texts), corpus_size, batch_size)
+
+    def transform(self, texts):
+        """Document-topic distributions of ``texts``."""
+        return self.lda.transform(self.vectorizer.transform(texts))
+
+    def top_words(self, num_words=10):
+        vocabulary = self.vocabulary
+        return [[vocabulary[j] for j in topic.argsort()[:-num_words - 1:-1]]
+                for topic in self.lda.components_]
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': MODEL_VERSION, 'model': self}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        """The model saved at ``path``, or None if missing or from another version."""
+        try:
+            with open(path, 'rb') as f:
+                payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        if not isinstance(payload, dict) or payload.get('version') != MODEL_VERSION:
+            return None
+        return payload['model']
+
+
+def model_path(bib_path, num_topics):
+    name = f'{os.path.basename(bib_path)}.online_lda_{num_topics}.pickle'
+    return os.path.join(cache_dir(bib_path), name)
+
+
+def update_topic_model(bib_path, num_topics=5, batch_size=BATCH_SIZE, rebuild=False):
+    """
+    Brings the saved online model of a bib file up to date.
+
+    Returns:
+        tuple: ``(model, trained)``, where ``trained`` is the number of
+               abstracts the model was trained on in this call.
+    """
+    path = model_path(bib_path, num_topics)
+    state_path = snapshot_path(bib_path, f'online_lda_{num_topics}')
+    entries = load_corpus(bib_path)
+    with_abstract = [entry for entry in entries if 'abstract' in entry.fields]
+
+    model = None if rebuild else OnlineTopicModel.load(path)
+    snapshot = load_snapshot(state_path) if model is not None else None
+    if model is None or snapshot is None:
+        abstracts = [entry.get('abstract') for entry in with_abstract]
+        features = document_term_matrix(abstracts, cache_directory=dtm_cache_dir(bib_path))
+        model = OnlineTopicModel(features.vocabulary, num_topics, features.params)
+        model.fit_matrix(features.matrix, batch_size)
+        trained = len(abstracts)
+    else:
+        delta = diff_corpus(entries, snapshot)
+        new = [entry.get('abstract') for entry in delta.added + delta.changed
+               if 'abstract' in entry.fields]
+        model.update(new, len(with_abstract), batch_size)
+        trained = len(new)
+
+    model.save(path)
+    save_snapshot(state_path, entries)
+    return model, trained
@@ -2,10 +2,11 @@ import matplotlib.pyplot as plt
 import collections
 import numpy as np
 import os
-import re
+import sys
 import json
 
-import json
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from corpus import load_corpus
 
 # --- Read the categorized papers ---
 with open('/Users/woodj/Desktop/congenial-potato/src/categorized_papers.json', 'r') as f:
@@ -15,17 +16,10 @@ methods_data = [paper['methodology_category'] for paper in categorized_papers]
 applications_data = [paper['application_category'] for paper in categorized_papers]
 
 # --- Read and parse the bib file for years ---
-with open('/Users/woodj/Desktop/congenial-potato/refs.bib', 'r') as f:
-    content = f.read()
-
-entries = content.split('\n@')
 years_data = []
-for entry in entries:
-    if not entry.strip():
-        continue
-    year_match = re.search(r'year\s*=\s*{(\d{4})}', entry, re.IGNORECASE)
-    if year_match:
-        years_data.append(int(year_match.group(1)))
+for entry in load_corpus('/Users/woodj/Desktop/congenial-potato/refs.bib'):
+    if entry.year is not None:
+        years_data.append(entry.year)
 
 
 # --- The rest of the plotting code remains the same ---
@@ -0,0 +1,150 @@
+"""
+Plans the keyword queries run by main.py and keeps them from re-fetching
+papers we already have.
+
+``expand_queries`` turns the keyword groups into one query per keyword of
+the second group (``(ML group) AND keyword``), the shape main.py has always
+searched. ``estimate_overlap`` looks at cached responses for those queries
+to show how much they overlap, and orders them so the query expected to
+contribute the most new papers runs first.
+
+``LocalIndex`` holds the DOIs and normalized titles of every entry in
+refs.bib; ``PaperFilter`` uses it, plus the paper ids already seen in this
+run, to classify each incoming paper as new, already known locally, or a
+duplicate of another query's result.
+"""
+
+from bibtex import normalize_doi, normalize_title
+from corpus import load_corpus
+from query_syntax import build_query_group, quote_keyword
+from response_cache import request_key
+from semantic_scholar import SEARCH_FIELDS
+
+
+def expand_queries(group_keywords, split_keywords):
+    """
+    Returns ``(query, label)`` pairs: ``(A OR B) AND k`` for each ``k`` in
+    ``split_keywords``, in sorted order so runs are reproducible.
+    """
+    group = build_query_group(sorted(group_keywords))
+    queries = []
+    for keyword in sorted(split_keywords):
+        quoted = quote_keyword(keyword)
+        queries.append((f"{group} AND {quoted}", f"ML AND {quoted}"))
+    return queries
+
+
+class LocalIndex:
+    """DOIs and normalized titles of the papers already in a bib file."""
+
+    def __init__(self, entries=()):
+        self.dois = set()
+        self.titles = set()
+        for entry in entries:
+            self.add(entry.doi, entry.title)
+
+    @classmethod
+    def from_bib(cls, bib_path):
+        return cls(load_corpus(bib_path))
+
+    def add(self, doi, title):
+        if doi:
+            self.dois.add(normalize_doi(doi))
+        if title:
+            self.titles.add(normalize_title(title))
+
+    def __contains__(self, paper):
+        """True if an API paper record matches a local entry by DOI or title."""
+        doi = (paper.get('externalIds') or {}).get('DOI')
+        if doi and normalize_doi(doi) in self.dois:
+            return True
+        title = paper.get('title')
+        return bool(title) and normalize_title(title) in self.titles
+
+
+class PaperFilter:
+    """
+    Classifies incoming papers as new, known locally, or duplicate.
+
+    Counts are kept per query label so every search or harvest can report
+    how many of its papers were actually new. Call it as the ``paper_filter``
+    of ``harvest`` (via ``for_query``) to write only new papers.
+    """
+
+    def __init__(self, local_index, seen_ids=None):
+        self.local_index = local_index
+        self.seen_ids = set(seen_ids or ())
+        self.counts = {}
+
+    def classify(self, paper, label="Query"):
+        """Returns 'new', 'known' or 'duplicate', and records the outcome."""
+        counts = self.counts.setdefault(label, {'new': 0, 'known': 0, 'duplicate': 0})
+        paper_id = paper.get('paperId')
+        if paper_id and paper_id in self.seen_ids:
+            outcome = 'duplicate'
+        elif paper in self.local_index:
+            outcome = 'known'
+        else:
+            outcome = 'new'
+        if paper_id:
+            self.seen_ids.add(paper_id)
+        counts[outcome] += 1
+        return outcome
+
+    def for_query(self, label):
+        """A predicate that keeps only new papers, counting under ``label``."""
+        return lambda paper: self.classify(paper, label) == 'new'
+
+    def report(self):
+        for label, counts in self.counts.items():
+            print(f"{label}: {counts['new']} new, {counts['known']} already in the bib, "
+                  f"{counts['duplicate']} duplicates of other queries")
+
+
+def cached_result_ids(cache, query, limit, fields=SEARCH_FIELDS):
+    """Paper ids of a cached /paper/search response, or None if not cached."""
+    data = cache.get(request_key('GET', 'paper/search',
+                                 {'query': query, 'offset': 0, 'limit': limit, 'fields': fields}))
+    if data is None:
+        return None
+    return {paper['paperId'] for paper in data.get('data') or [] if paper.get('paperId')}
+
+
+def estimate_overlap(queries, cache, limit, fields=SEARCH_FIELDS):
+    """
+    Orders queries by how many new papers their cached results promise.
+
+    Greedily picks the query whose cached result set adds the most unseen
+    ids, so overlap between queries is counted once. Queries without cached
+    results keep their relative order and go last, since nothing is known
+    about them.
+
+    Returns:
+        list: ``(query, label, cached, new)`` tuples in the planned order;
+              ``cached`` and ``new`` are None for uncached queries.
+    """
+    cached = []
+    uncached = []
+    for query, label in queries:
+        ids = cached_result_ids(cache, query, limit, fields)
+        (uncached if ids is None else cached).append((query, label, ids))
+
+    plan = []
+    covered = set()
+    while cached:
+        best = max(cached, key=lambda item: len(item[2] - covered))
+        cached.remove(best)
+        query, label, ids = best
+        plan.append((query, label, len(ids), len(ids - covered)))
+        covered |= ids
+    plan.extend((query, label, None, None) for query, label, _ in uncached)
+    return plan
+
+
+def print_plan(plan):
+    print("Query plan (from cached results):")
+    for query, label, cached, new in plan:
+        if cached is None:
+            print(f"  {label}: not cached")
+        else:
+            print(f"  {label}: {cached} cached results, {new} not returned by earlier queries")
@@ -0,0 +1,24 @@
+"""
+Helpers that build Semantic Scholar boolean query strings.
+"""
+
+def build_query_group(keywords):
+    """
+    Creates an (A OR B OR C) string from a list of keywords.
+    Handles multi-word phrases with quotes.
+    """
+    quoted_keywords = []
+    for k in keywords:
+        # If a keyword contains a space, wrap it in quotes for an exact phrase match
+        if ' ' in k:
+            quoted_keywords.append(f'"{k}"')
+        else:
+            quoted_keywords.append(k)
+    
+    return f"({' OR '.join(quoted_keywords)})"
+
+def quote_keyword(keyword):
+    """Helper function to quote a single keyword if it has a space."""
+    if ' ' in keyword:
+        return f'"{keyword}"'
+    return keyword
@@ -0,0 +1,117 @@
+"""
+Content-addressed on-disk cache for Semantic Scholar API responses.
+
+Each response is stored as ``<sha256>.json``, keyed on the request method,
+endpoint and normalized parameters: whitespace in the query is collapsed and
+the ``fields`` list is sorted. Re-running a search with the same keywords
+therefore hits the cache even if the query was built in a different order.
+
+Entries expire after ``ttl`` seconds. When the cache grows past
+``max_bytes``, the least recently used entries (by file mtime, which is
+bumped on every hit) are evicted. In offline mode, expired entries are still
+served and a miss raises ``CacheMiss`` instead of touching the network.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+
+class CacheMiss(LookupError):
+    """Raised in offline mode when a request has no cached response."""
+
+
+def _normalize_params(params):
+    normalized = {}
+    for name, value in (params or {}).items():
+        value = str(value)
+        if name == 'query':
+            value = ' '.join(value.split())
+        elif name == 'fields':
+            value = ','.join(sorted(field.strip() for field in value.split(',') if field.strip()))
+        normalized[name] = value
+    return normalized
+
+
+def request_key(method, path, params=None, json_body=None):
+    """SHA-256 of the normalized request."""
+    canonical = json.dumps({
+        'method': method.upper(),
+        'path': path.strip('/'),
+        'params': _normalize_params(params),
+        'body': json_body,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Args:
+        directory (str): Where the cached responses live.
+        ttl (float): Seconds a response stays fresh.
+        max_bytes (int): Size budget; least recently used entries go first.
+        offline (bool): Serve only from the cache, ignoring the TTL.
+    """
+
+    def __init__(self, directory, ttl=7 * 24 * 3600, max_bytes=256 << 20, offline=False):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._size = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        """Returns the cached response for ``key``, or None if missing or stale."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not self.offline and time.time() - entry['stored_at'] > self.ttl:
+            return None
+        # The mtime doubles as the last-access time for LRU eviction.
+        os.utime(path)
+        return entry['data']
+
+    def put(self, key, data):
+        path = self._path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'stored_at': time.time(), 'data': data}, f, ensure_ascii=False)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+
+        if self._size is None:
+            self._size = self._disk_usage()
+        else:
+            self._size += os.path.getsize(path) - old_size
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        with os.scandir(self.directory) as it:
+            return [entry for entry in it if entry.name.endswith('.json')]
+
+    def _disk_usage(self):
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if size <= self.max_bytes:
+                break
+            size -= entry.stat().st_size
+            os.remove(entry.path)
+        self._size = size
+
+    def clear(self):
+        for entry in self._entries():
+            os.remove(entry.path)
+        self._size = 0
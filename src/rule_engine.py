@@ -0,0 +1,221 @@
+"""
+Data-driven paper categorization.
+
+A rule file (JSON, see rules/) lists, for each dimension such as
+"application" or "methodology", keyword rules in priority order and a
+default label, plus per-citation-key overrides:
+
+    {
+        "dimensions": {
+            "application": {
+                "default": "Other",
+                "rules": [
+                    {"label": "Aquaculture & Farming",
+                     "keywords": ["aquaculture", "fish farming"],
+                     "whole_word": false},
+                    ...
+                ]
+            }
+        },
+        "overrides": {
+            "Abd-El-Atty2024": {"application": "Aquaculture & automated monitoring"}
+        }
+    }
+
+For each dimension the first rule with a keyword in the paper's lowercased
+abstract and title decides the label; an override for the paper's key wins
+over the rules.
+
+``load_rules`` compiles a file once (again only if it changes on disk).
+``RuleSet.categorize_batch`` categorizes a whole corpus with a single
+keyword scan: the documents are joined and scanned by one KeywordMatcher
+holding the keywords of every rule, and each match is mapped back to its
+document. Every call updates per-rule statistics (how often a rule matched
+and how often it decided the label); with ``profile=True`` each rule's
+keywords are also timed on their own, and ``print_report`` shows which rules
+dominate and which never fire.
+
+Usage:
+    python rule_engine.py rules/application_focus.json ../refs.bib --profile
+"""
+
+import argparse
+import json
+import os
+import time
+from bisect import bisect_right
+
+from keyword_matcher import KeywordMatcher
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules')
+
+_SEPARATOR = '\0'
+
+
+def document_text(abstract, title):
+    """The text keyword rules are matched against."""
+    return (abstract + ' ' + title).lower()
+
+
+class Rule:
+    __slots__ = ('dimension', 'label', 'keywords', 'whole_word', 'hits', 'decided', 'seconds')
+
+    def __init__(self, dimension, label, keywords, whole_word=False):
+        self.dimension = dimension
+        self.label = label
+        self.keywords = list(keywords)
+        self.whole_word = whole_word
+        self.hits = 0
+        self.decided = 0
+        self.seconds = 0.0
+
+
+class RuleSet:
+    """
+    Compiled categorization rules.
+
+    Args:
+        dimensions (dict): ``{dimension: {'default': label, 'rules': [...]}}``
+                           as in a rule file.
+        overrides (dict): ``{citation_key: {dimension: label}}``.
+    """
+
+    def __init__(self, dimensions, overrides=None):
+        self.defaults = {name: spec.get('default', 'Other') for name, spec in dimensions.items()}
+        self.overrides = overrides or {}
+        self.rules = []
+        for name, spec in dimensions.items():
+            for rule in spec.get('rules', []):
+                self.rules.append(Rule(name, rule['label'], rule['keywords'],
+                                       rule.get('whole_word', False)))
+
+        # One matcher for every rule's keywords; a keyword may feed several rules.
+        self.matcher = KeywordMatcher()
+        self._rules_of = {}
+        whole_word = {}
+        for index, rule in enumerate(self.rules):
+            for keyword in rule.keywords:
+                if whole_word.setdefault(keyword, rule.whole_word) != rule.whole_word:
+                    raise ValueError(f"Keyword {keyword!r} is both whole-word and not")
+                self.matcher.add(keyword, rule.whole_word)
+                self._rules_of.setdefault(keyword, set()).add(index)
+        self.matcher.compile()
+
+        self.documents = 0
+        self.overridden = 0
+        self.scan_seconds = 0.0
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+        return cls(spec['dimensions'], spec.get('overrides'))
+
+    def categorize(self, text, key=None):
+        """Labels for one document, as ``{dimension: label}``."""
+        return self.categorize_batch([(key, text)])[0]
+
+    def categorize_batch(self, documents, profile=False):
+        """
+        Labels a batch of documents in one scan.
+
+        Args:
+            documents (iterable): ``(citation_key, text)`` pairs; the key may
+                                  be None. See ``document_text``.
+            profile (bool): Also time each rule's keywords separately.
+
+        Returns:
+            list: One ``{dimension: label}`` dict per document, in order.
+        """
+        documents = list(documents)
+        texts = [text.replace(_SEPARATOR, ' ') for _, text in documents]
+        corpus = _SEPARATOR.join(texts)
+        starts = []
+        position = 0
+        for text in texts:
+            starts.append(position)
+            position += len(text) + 1
+
+        began = time.perf_counter()
+        matched = [set() for _ in documents]
+        for start, keyword in self.matcher.finditer(corpus):
+            matched[bisect_right(starts, start) - 1].update(self._rules_of[keyword])
+        self.scan_seconds += time.perf_counter() - began
+
+        if profile:
+            for rule in self.rules:
+                began = time.perf_counter()
+                KeywordMatcher(rule.keywords, rule.whole_word).matches(corpus)
+                rule.seconds += time.perf_counter() - began
+
+        results = []
+        for (key, _), indices in zip(documents, matched):
+            labels = dict(self.defaults)
+            decided = set()
+            for index in sorted(indices):
+                rule = self.rules[index]
+                rule.hits += 1
+                if rule.dimension not in decided:
+                    decided.add(rule.dimension)
+                    labels[rule.dimension] = rule.label
+                    rule.decided += 1
+            override = self.overrides.get(key) if key is not None else None
+            if override:
+                labels.update(override)
+                self.overridden += 1
+            results.append(labels)
+        self.documents += len(documents)
+        return results
+
+    def print_report(self):
+        print(f"{self.documents} documents, {self.overridden} with overrides, "
+              f"keyword scan {self.scan_seconds * 1000:.1f} ms")
+        if not self.rules:
+            return
+        print(f"{'Dimension':<14}{'Rule':<45}{'Hits':>7}{'Decided':>9}{'ms':>9}")
+        for rule in sorted(self.rules, key=lambda rule: (-rule.seconds, -rule.hits)):
+            print(f"{rule.dimension:<14}{rule.label[:44]:<45}{rule.hits:>7}{rule.decided:>9}"
+                  f"{rule.seconds * 1000:>9.1f}")
+        idle = [rule for rule in self.rules if not rule.hits]
+        if idle:
+            print("Rules that never fired:")
+            for rule in idle:
+                print(f"  {rule.dimension}: {rule.label} ({', '.join(rule.keywords)})")
+
+
+_loaded = {}
+
+def load_rules(path):
+    """The compiled RuleSet for a rule file, reused until the file changes."""
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _loaded[path] = (mtime, RuleSet.from_file(path))
+    return cached[1]
+
+
+if __name__ == "__main__":
+    from corpus import load_corpus
+
+    parser = argparse.ArgumentParser(description="Categorize a bib file with a rule file.")
+    parser.add_argument('rules', help="rule file (JSON)")
+    parser.add_argument('bib', help="bib file to categorize")
+    parser.add_argument('--profile', action='store_true', help="time each rule separately")
+    args = parser.parse_args()
+
+    rules = load_rules(args.rules)
+    entries = load_corpus(args.bib)
+    results = rules.categorize_batch(
+        [(entry.key, document_text(entry.abstract, entry.title)) for entry in entries],
+        profile=args.profile)
+
+    for dimension in rules.defaults:
+        counts = {}
+        for labels in results:
+            counts[labels[dimension]] = counts.get(labels[dimension], 0) + 1
+        print(f"\n{dimension}:")
+        for label, count in sorted(counts.items(), key=lambda item: -item[1]):
+            print(f"  {count:>5}  {label}")
+    print()
+    rules.print_report()
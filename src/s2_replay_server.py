@@ -0,0 +1,320 @@
+"""
+Local stand-in for the Semantic Scholar search and batch endpoints.
+
+Serves /graph/v1/paper/search (offset/limit pagination, capped at 1000
+results like the real API), /graph/v1/paper/search/bulk (continuation
+tokens) and POST /graph/v1/paper/batch. Responses come from, in order:
+
+  1. recorded responses in a ResponseCache directory (e.g. .bibcache/http
+     after a live run), matched on the same normalized request key, and
+  2. a pool of papers loaded from harvest JSONL files, generated from a
+     bib file, or synthesized.
+
+Latency and rate limiting are simulated: every request waits ``latency``
+seconds (plus jitter), and requests beyond ``rate``/``burst`` get HTTP 429
+with a Retry-After header. This lets main.py and the harvest client be
+exercised and benchmarked without touching the live API.
+
+Usage:
+    python s2_replay_server.py --from-bib ../refs.bib --rate 5 --latency 0.05
+    python main.py --no-cache --base-url http://127.0.0.1:8000/graph/v1
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bibtex import normalize_doi
+from corpus import load_corpus
+from response_cache import ResponseCache, request_key
+from text_index import TextIndex
+
+BULK_PAGE_SIZE = 1000
+SEARCH_WINDOW = 1000
+MAX_SEARCH_LIMIT = 100
+
+# The bulk endpoint spells AND as '+' and OR as '|' (see semantic_scholar.to_bulk_syntax).
+_BULK_AND = re.compile(r'\s+\+\s+')
+_BULK_OR = re.compile(r'\s+\|\s+')
+
+
+def papers_from_bib(bib_path):
+    """Builds API-shaped paper records from a bib file."""
+    papers = []
+    for entry in load_corpus(bib_path):
+        paper = {
+            'paperId': hashlib.sha1(entry.key.encode('utf-8')).hexdigest(),
+            'title': entry.title,
+            'abstract': entry.abstract or None,
+            'year': entry.year,
+            'authors': [{'name': name.strip()} for name in entry.text('author').split(' and ') if name.strip()],
+            'url': entry.text('url') or None,
+            'externalIds': {'DOI': entry.doi} if entry.doi else {},
+        }
+        papers.append(paper)
+    return papers
+
+
+def papers_from_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def synthetic_papers(count, seed=0):
+    """``count`` placeholder papers, for load tests that need volume only."""
+    rng = random.Random(seed)
+    words = ['fish', 'plankton', 'biomass', 'acoustic', 'learning', 'deep', 'sonar', 'stock']
+    return [{
+        'paperId': f"{i:040x}",
+        'title': ' '.join(rng.choice(words) for _ in range(6)),
+        'abstract': ' '.join(rng.choice(words) for _ in range(60)),
+        'year': rng.randint(2015, 2025),
+        'authors': [{'name': f"Author {i}"}],
+        'url': None,
+        'externalIds': {'DOI': f"10.0000/synthetic.{i}"},
+    } for i in range(count)]
+
+
+class _Throttle:
+    """Thread-safe token bucket deciding which requests get a 429."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def admit(self):
+        """Returns 0 if the request may proceed, else seconds to wait."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+class ReplayServer:
+    """
+    Args:
+        papers (list): Paper records served by search and batch lookups.
+        recorded_dir (str): ResponseCache directory to replay first, if any.
+        latency (float): Seconds added to every response.
+        jitter (float): Extra random latency, up to this many seconds.
+        rate (float): Requests per second before 429s; None disables throttling.
+        burst (int): Requests admitted back to back.
+        host (str), port (int): Where to listen; port 0 picks a free port.
+    """
+
+    def __init__(self, papers=(), recorded_dir=None, latency=0.0, jitter=0.0, rate=None, burst=1,
+                 host='127.0.0.1', port=0):
+        self.papers = list(papers)
+        self.by_doi = {normalize_doi(p['externalIds']['DOI']): p
+                       for p in self.papers if (p.get('externalIds') or {}).get('DOI')}
+        self.by_id = {p['paperId']: p for p in self.papers if p.get('paperId')}
+        self.recorded = ResponseCache(recorded_dir, offline=True) if recorded_dir else None
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle = _Throttle(rate, burst) if rate else None
+        self.stats = {'requests': 0, 'throttled': 0, 'replayed': 0}
+        self._matches = {}
+        # Document ids are positions in self.papers.
+        self._text_index = TextIndex()
+        for paper in self.papers:
+            self._text_index.add(paper.get('paperId'), None,
+                                 [paper.get('title') or '', paper.get('abstract') or ''])
+        self._stats_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/graph/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def matching_papers(self, query):
+        """
+        Papers whose title or abstract satisfy the query, evaluated like
+        text_index.py does: AND, OR, parentheses, quoted phrases and '-'
+        exclusion, in either the relevance or the bulk syntax.
+
+        Raises:
+            ValueError: If the query cannot be parsed.
+        """
+        matches = self._matches.get(query)
+        if matches is not None:
+            return matches
+        expression = _BULK_OR.sub(' OR ', _BULK_AND.sub(' AND ', query))
+        if not expression.strip():
+            return self.papers
+        matches = [self.papers[doc] for doc in self._text_index.search(expression)]
+        self._matches[query] = matches
+        return matches
+
+    def respond(self, method, path, params, body):
+        """Returns ``(status, payload)`` for one request."""
+        api_path = path.split('/graph/v1/', 1)[-1]
+        if self.recorded is not None:
+            data = self.recorded.get(request_key(method, api_path, params, body))
+            if data is not None:
+                self._count('replayed')
+                return 200, data
+
+        fields = [f for f in params.get('fields', '').split(',') if f]
+        if method == 'GET' and api_path == 'paper/search':
+            offset = int(params.get('offset', 0))
+            limit = min(int(params.get('limit', 10)), MAX_SEARCH_LIMIT)
+            if offset + limit > SEARCH_WINDOW:
+                return 400, {'error': 'offset + limit must be <= 1000'}
+            try:
+                matches = self.matching_papers(params.get('query', ''))
+            except ValueError as error:
+                return 400, {'error': str(error)}
+            page = matches[offset:offset + limit]
+            payload = {'total': len(matches), 'offset': offset,
+                       'data': [_select(p, fields) for p in page]}
+            if offset + len(page) < min(len(matches), SEARCH_WINDOW):
+                payload['next'] = offset + len(page)
+            return 200, payload
+
+        if method == 'GET' and api_path == 'paper/search/bulk':
+            try:
+                matches = self.matching_papers(params.get('query', ''))
+            except ValueError as error:
+                return 400, {'error': str(error)}
+            start = int(params.get('token') or 0)
+            page = matches[start:start + BULK_PAGE_SIZE]
+            end = start + len(page)
+            return 200, {'total': len(matches), 'token': str(end) if end < len(matches) else None,
+                         'data': [_select(p, fields) for p in page]}
+
+        if method == 'POST' and api_path == 'paper/batch':
+            results = []
+            for paper_id in (body or {}).get('ids', []):
+                if paper_id.upper().startswith('DOI:'):
+                    paper = self.by_doi.get(normalize_doi(paper_id[4:]))
+                else:
+                    paper = self.by_id.get(paper_id)
+                results.append(_select(paper, fields) if paper else None)
+            return 200, results
+
+        return 404, {'error': f"Unsupported endpoint: {method} {path}"}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _serve(self, method):
+                server._count('requests')
+                if server.throttle is not None:
+                    wait = server.throttle.admit()
+                    if wait:
+                        server._count('throttled')
+                        self._send(429, {'message': 'Too Many Requests'},
+                                   {'Retry-After': f"{wait:.3f}"})
+                        return
+
+                delay = server.latency + random.uniform(0, server.jitter)
+                if delay:
+                    time.sleep(delay)
+
+                parsed = urllib.parse.urlparse(self.path)
+                params = dict(urllib.parse.parse_qsl(parsed.query))
+                body = None
+                if method == 'POST':
+                    length = int(self.headers.get('Content-Length') or 0)
+                    body = json.loads(self.rfile.read(length) or b'null')
+                status, payload = server.respond(method, parsed.path, params, body)
+                self._send(status, payload)
+
+            def _send(self, status, payload, headers=None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._serve('GET')
+
+            def do_POST(self):
+                self._serve('POST')
+
+        return Handler
+
+
+def _select(paper, fields):
+    """Restricts a paper to the requested fields (paperId is always kept)."""
+    if not fields:
+        return {'paperId': paper.get('paperId'), 'title': paper.get('title')}
+    selected = {'paperId': paper.get('paperId')}
+    for field in fields:
+        top = field.split('.', 1)[0]
+        if top in paper:
+            selected[top] = paper[top]
+    return selected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Semantic Scholar API.")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--papers', nargs='*', default=[], help="harvest JSONL files to serve")
+    parser.add_argument('--from-bib', help="serve the entries of this bib file")
+    parser.add_argument('--synthetic', type=int, default=0, help="add this many synthetic papers")
+    parser.add_argument('--recorded', help="ResponseCache directory to replay")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to each response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="random extra latency, in seconds")
+    parser.add_argument('--rate', type=float, help="requests per second before answering 429")
+    parser.add_argument('--burst', type=int, default=1)
+    args = parser.parse_args()
+
+    papers = []
+    for path in args.papers:
+        papers.extend(papers_from_jsonl(path))
+    if args.from_bib:
+        papers.extend(papers_from_bib(args.from_bib))
+    papers.extend(synthetic_papers(args.synthetic))
+
+    server = ReplayServer(papers, args.recorded, args.latency, args.jitter, args.rate, args.burst,
+                          port=args.port)
+    print(f"Serving {len(papers)} papers at {server.url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
@@ -0,0 +1,330 @@
+"""
+Asyncio client for the Semantic Scholar Graph API.
+
+Requests are paced by a token bucket instead of fixed sleeps, so a batch of
+queries finishes as fast as the API's rate limit allows. HTTP 429 and 5xx
+responses are retried with jittered exponential backoff, honouring any
+``Retry-After`` header the server sends.
+
+The blocking ``requests`` calls run in worker threads over one pooled
+``requests.Session``, so callers can ``asyncio.gather`` many queries.
+
+Pass a ``ResponseCache`` to serve repeated requests from disk (and, in
+offline mode, to never touch the network).
+
+``harvest`` pages through a query's complete result set, appending papers
+to a JSONL file as they arrive and checkpointing after every page so an
+interrupted harvest resumes where it stopped.
+
+Set the ``S2_API_KEY`` environment variable to use an API key; get a free
+one at https://www.semanticscholar.org/product/api
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import urllib.parse
+
+import requests
+
+from response_cache import CacheMiss, request_key
+
+API_ROOT = "https://api.semanticscholar.org/graph/v1"
+SEARCH_FIELDS = "title,abstract,year,authors.name,url,keywords,paperId,externalIds"
+
+# Requests per second. Keyed access is granted 1 request/second; the public
+# pool is shared by everyone, so stay well below that without a key.
+RATE_WITH_KEY = 1.0
+RATE_WITHOUT_KEY = 0.5
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# /paper/search serves at most this many results per query (offset + limit).
+RELEVANCE_SEARCH_WINDOW = 1000
+# /paper/batch accepts at most this many ids per request.
+BATCH_LIMIT = 500
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket: ``rate`` tokens per second, at most ``capacity``
+    banked. ``acquire`` waits until a token is available.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = None
+        self._loop = None
+
+    async def acquire(self):
+        # asyncio.Lock is bound to one event loop; clients may outlive a loop.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _retry_after(response):
+    """Seconds requested by a Retry-After header, or None."""
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class SemanticScholarClient:
+    """
+    Rate-limited, retrying client for the Semantic Scholar Graph API.
+
+    Args:
+        api_key (str): API key; defaults to the S2_API_KEY environment variable.
+        rate (float): Requests per second. Defaults to RATE_WITH_KEY or
+                      RATE_WITHOUT_KEY depending on whether a key is set.
+        burst (int): Requests that may be issued back to back.
+        max_retries (int): Retries for 429/5xx responses and connection errors.
+        backoff (float): Base delay in seconds for exponential backoff.
+        max_backoff (float): Upper bound on a single backoff delay.
+        base_url (str): API root, e.g. a local stand-in server for testing.
+        timeout (float): Per-request timeout in seconds.
+        cache (ResponseCache): Optional cache consulted before each request.
+    """
+
+    def __init__(self, api_key=None, rate=None, burst=1, max_retries=5, backoff=1.0,
+                 max_backoff=60.0, base_url=API_ROOT, timeout=30.0, cache=None):
+        self.api_key = api_key if api_key is not None else os.environ.get('S2_API_KEY')
+        if rate is None:
+            rate = RATE_WITH_KEY if self.api_key else RATE_WITHOUT_KEY
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        if self.api_key:
+            self.session.headers['x-api-key'] = self.api_key
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'cache_hits': 0}
+
+    def build_url(self, path, params):
+        # The API is strict and returns 400 if spaces are encoded as '+',
+        # so everything is percent-encoded with %20.
+        query = urllib.parse.urlencode(params, quote_via=urllib.parse.quote)
+        return f"{self.base_url}/{path.lstrip('/')}?{query}"
+
+    def _delay(self, attempt, response=None):
+        if response is not None:
+            requested = _retry_after(response)
+            if requested is not None:
+                return requested
+        ceiling = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return random.uniform(ceiling / 2, ceiling)
+
+    async def request_json(self, method, path, params=None, json_body=None):
+        """
+        Issues one API call, retrying throttled and failed attempts.
+
+        Raises:
+            requests.HTTPError: For non-retryable statuses, or when retries
+                                are exhausted.
+            requests.RequestException: When the connection keeps failing.
+            CacheMiss: When the cache is offline and has no response.
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = request_key(method, path, params, json_body)
+            data = self.cache.get(cache_key)
+            if data is not None:
+                self.stats['cache_hits'] += 1
+                return data
+            if self.cache.offline:
+                raise CacheMiss(f"No cached response for {method} {path} {params}")
+
+        url = self.build_url(path, params or {})
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            self.stats['requests'] += 1
+            try:
+                response = await asyncio.to_thread(
+                    self.session.request, method, url, json=json_body, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                self.stats['retries'] += 1
+                await asyncio.sleep(self._delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                if response.status_code == 429:
+                    self.stats['throttled'] += 1
+                self.stats['retries'] += 1
+                await asyncio.sleep(self._delay(attempt, response))
+                continue
+
+            response.raise_for_status()
+            data = response.json()
+            if cache_key is not None:
+                self.cache.put(cache_key, data)
+            return data
+
+    async def get_json(self, path, params=None):
+        return await self.request_json('GET', path, params)
+
+    async def search(self, query, limit=10, offset=0, fields=SEARCH_FIELDS):
+        """One page of /paper/search results as the decoded JSON response."""
+        params = {'query': query, 'offset': offset, 'limit': limit, 'fields': fields}
+        return await self.get_json('paper/search', params)
+
+    async def paper_batch(self, ids, fields):
+        """
+        Looks up to BATCH_LIMIT papers in one POST to /paper/batch.
+
+        ``ids`` may be paper ids or prefixed ids such as ``DOI:10.1000/x``.
+        Returns one result per id, in order; unknown ids come back as None.
+        """
+        if len(ids) > BATCH_LIMIT:
+            raise ValueError(f"/paper/batch takes at most {BATCH_LIMIT} ids, got {len(ids)}")
+        return await self.request_json('POST', 'paper/batch', {'fields': fields}, {'ids': list(ids)})
+
+    async def search_many(self, queries, limit=10, fields=SEARCH_FIELDS):
+        """
+        Runs several searches concurrently within the rate limit.
+
+        Returns one result per query, in order: the JSON response, or the
+        exception that query raised.
+        """
+        tasks = [self.search(query, limit=limit, fields=fields) for query in queries]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        self.session.close()
+
+
+def to_bulk_syntax(query):
+    """
+    Rewrites an ``(A OR B) AND "c d"`` query into the bulk-search syntax,
+    which spells AND as '+' and OR as '|'.
+    """
+    query = re.sub(r'\s+AND\s+', ' + ', query)
+    return re.sub(r'\s+OR\s+', ' | ', query)
+
+
+def load_checkpoint(path):
+    """The harvest checkpoint saved at ``path``, or None if there is none."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(path, checkpoint):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+async def harvest(client, query, sink_path, checkpoint_path=None, mode='bulk',
+                  fields=SEARCH_FIELDS, page_size=100, max_papers=None, paper_filter=None):
+    """
+    Streams every result of a query into a JSONL file, resumably.
+
+    Two paging modes are supported:
+      - 'bulk': /paper/search/bulk with continuation tokens (up to 1000
+        papers per call and no cap on the total). The query is translated
+        with ``to_bulk_syntax``.
+      - 'relevance': /paper/search with offset/limit, which the API caps at
+        the first RELEVANCE_SEARCH_WINDOW results.
+
+    After each page is appended and flushed, the position (token or offset)
+    and the sink's size are written to ``checkpoint_path`` (default:
+    ``sink_path + '.checkpoint'``). On resume the sink is truncated back to
+    the checkpointed size, so a page is never written twice.
+
+    Args:
+        client (SemanticScholarClient): Client used for the requests.
+        query (str): The search query.
+        sink_path (str): JSONL file the papers are appended to.
+        checkpoint_path (str): Where the harvest position is recorded.
+        mode (str): 'bulk' or 'relevance'.
+        fields (str): Comma-separated fields to request.
+        page_size (int): Papers per page in 'relevance' mode (max 100).
+        max_papers (int): Stop after this many papers, if given.
+        paper_filter (callable): If given, only papers for which it returns
+                                 True are written to the sink.
+
+    Returns:
+        dict: The final checkpoint (position, papers harvested and written,
+              total, done).
+    """
+    if mode not in ('bulk', 'relevance'):
+        raise ValueError(f"Unknown harvest mode: {mode}")
+    checkpoint_path = checkpoint_path or sink_path + '.checkpoint'
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint is None or checkpoint.get('query') != query or checkpoint.get('mode') != mode:
+        checkpoint = {'query': query, 'mode': mode, 'token': None, 'offset': 0,
+                      'harvested': 0, 'written': 0, 'total': None, 'sink_bytes': 0, 'done': False}
+    checkpoint.setdefault('written', checkpoint['harvested'])
+    if checkpoint['done']:
+        return checkpoint
+
+    with open(sink_path, 'a+b') as sink:
+        sink.truncate(checkpoint['sink_bytes'])
+        sink.seek(0, os.SEEK_END)
+
+        while max_papers is None or checkpoint['harvested'] < max_papers:
+            if mode == 'bulk':
+                params = {'query': to_bulk_syntax(query), 'fields': fields}
+                if checkpoint['token']:
+                    params['token'] = checkpoint['token']
+                data = await client.get_json('paper/search/bulk', params)
+            else:
+                limit = min(page_size, RELEVANCE_SEARCH_WINDOW - checkpoint['offset'])
+                data = await client.search(query, limit=limit, offset=checkpoint['offset'],
+                                           fields=fields)
+
+            papers = data.get('data') or []
+            for paper in papers:
+                if paper_filter is not None and not paper_filter(paper):
+                    continue
+                sink.write(json.dumps(paper, ensure_ascii=False).encode('utf-8') + b'\n')
+                checkpoint['written'] += 1
+            sink.flush()
+            os.fsync(sink.fileno())
+
+            checkpoint['harvested'] += len(papers)
+            checkpoint['total'] = data.get('total', checkpoint['total'])
+            checkpoint['sink_bytes'] = sink.tell()
+            if mode == 'bulk':
+                checkpoint['token'] = data.get('token')
+                checkpoint['done'] = not checkpoint['token'] or not papers
+            else:
+                checkpoint['offset'] += len(papers)
+                available = min(checkpoint['total'] or 0, RELEVANCE_SEARCH_WINDOW)
+                checkpoint['done'] = not papers or checkpoint['offset'] >= available
+            _save_checkpoint(checkpoint_path, checkpoint)
+
+            if checkpoint['done']:
+                break
+
+    return checkpoint
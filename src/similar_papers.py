@@ -0,0 +1,266 @@
+"""
+"Find papers like this one" over the abstracts of a bib file.
+
+Papers are vectors, either
+
+  - ``tfidf``: TF-IDF weights of the cached document-term matrix
+    (features.py), reduced to PROJECTED_DIMENSIONS with a sparse random
+    projection, or
+  - ``embeddings``: the sentence embeddings bertopic_analysis.py caches
+    (embedding_store.py),
+
+normalized so that a dot product is the cosine similarity.
+
+Neighbours are found with an inverted-file (IVF) index: k-means splits the
+vectors into about sqrt(n) cells, and a query is only compared with the
+vectors of the ``probes`` cells whose centroids are closest to it. Probing
+every cell gives exact results. The index is stored in ``.bibcache/ann``
+and only rebuilt when the abstracts change.
+
+Usage:
+    python similar_papers.py Yang2024 Yuan2025 --bib ../refs.bib -k 5
+    python similar_papers.py --text "plankton image classification" --bib ../refs.bib
+    python similar_papers.py --check-categories categorized_papers.json --bib ../refs.bib
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+from collections import Counter
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.feature_extraction.text import TfidfTransformer
+from sklearn.random_projection import SparseRandomProjection
+
+from corpus import cache_dir, load_corpus
+from features import document_term_matrix, dtm_cache_dir
+
+PROJECTED_DIMENSIONS = 256
+DEFAULT_PROBES = 8
+INDEX_FORMAT = 1
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def paper_vectors(bib_path, abstracts, source='tfidf', random_state=0):
+    """
+    Unit vectors of ``abstracts`` and a function that maps new texts into the same space.
+
+    Returns:
+        tuple: ``(vectors, encode, digest)``; ``digest`` identifies the
+               vectors for the index cache.
+    """
+    if source == 'tfidf':
+        features = document_term_matrix(abstracts, cache_directory=dtm_cache_dir(bib_path))
+        tfidf = TfidfTransformer().fit(features.matrix)
+        dimensions = min(PROJECTED_DIMENSIONS, features.shape[1])
+        projection = SparseRandomProjection(n_components=dimensions, dense_output=True,
+                                            random_state=random_state).fit(features.matrix)
+        vectorizer = features.vectorizer()
+
+        def encode(texts):
+            return _normalize(projection.transform(tfidf.transform(vectorizer.transform(texts))))
+
+        vectors = _normalize(projection.transform(tfidf.transform(features.matrix)))
+        return vectors, encode, f'tfidf-{dimensions}-{random_state}-{features.digest}'
+
+    if source == 'embeddings':
+        from embedding_store import EMBEDDING_MODEL, EmbeddingStore, embed_abstracts, embedding_cache_dir
+
+        embeddings, _ = embed_abstracts(abstracts, bib_path)
+        store = EmbeddingStore(embedding_cache_dir(bib_path), EMBEDDING_MODEL)
+        digest = hashlib.sha256(EMBEDDING_MODEL.encode('utf-8'))
+        for abstract in abstracts:
+            digest.update(hashlib.sha1(abstract.encode('utf-8')).digest())
+        return _normalize(embeddings), lambda texts: _normalize(store.embed(texts)), digest.hexdigest()
+
+    raise ValueError(f"Unknown vector source {source!r}")
+
+
+class IVFIndex:
+    """
+    Inverted-file index over unit vectors.
+
+    Attributes:
+        vectors (numpy.ndarray): ``(n, dim)`` indexed vectors.
+        centroids (numpy.ndarray): ``(cells, dim)`` unit k-means centroids.
+        order (numpy.ndarray): Row numbers grouped by cell.
+        offsets (numpy.ndarray): Cell ``c`` holds ``order[offsets[c]:offsets[c + 1]]``.
+        digest (str): Identifies the indexed vectors.
+    """
+
+    def __init__(self, vectors, centroids, order, offsets, digest=None):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.digest = digest
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @classmethod
+    def build(cls, vectors, cells=None, digest=None, random_state=0):
+        cells = cells or max(1, int(round(math.sqrt(len(vectors)))))
+        cells = min(cells, len(vectors))
+        kmeans = KMeans(n_clusters=cells, n_init=3, random_state=random_state).fit(vectors)
+        assignment = kmeans.labels_
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.searchsorted(assignment[order], np.arange(cells + 1))
+        return cls(vectors, _normalize(kmeans.cluster_centers_), order, offsets, digest)
+
+    def search(self, queries, k=10, probes=DEFAULT_PROBES, exclude=None):
+        """
+        Approximate top-``k`` neighbours of a batch of unit vectors.
+
+        Args:
+            queries (numpy.ndarray): ``(q, dim)`` unit vectors.
+            k (int): Neighbours per query.
+            probes (int): Cells searched per query.
+            exclude (list): Optional row number per query to leave out, such
+                            as the query paper itself.
+
+        Returns:
+            tuple: ``(rows, scores)``, both ``(q, k)`` and best first; rows
+                   are -1 where fewer than ``k`` candidates were found.
+        """
+        queries = np.atleast_2d(queries)
+        probes = min(probes, len(self.centroids))
+        cell_scores = queries @ self.centroids.T
+        nearest_cells = np.argpartition(-cell_scores, probes - 1, axis=1)[:, :probes]
+
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, cells in enumerate(nearest_cells):
+            candidates = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in cells])
+            if exclude is not None and exclude[q] is not None:
+                candidates = candidates[candidates != exclude[q]]
+            if not len(candidates):
+                continue
+            similarity = self.vectors[candidates] @ queries[q]
+            top = min(k, len(candidates))
+            best = np.argpartition(-similarity, top - 1)[:top]
+            best = best[np.argsort(-similarity[best])]
+            rows[q, :top] = candidates[best]
+            scores[q, :top] = similarity[best]
+        return rows, scores
+
+    def save(self, path):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, format=INDEX_FORMAT, vectors=self.vectors, centroids=self.centroids,
+                 order=self.order, offsets=self.offsets, digest=np.array(self.digest))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """The index saved at ``path``, or None if missing or of another format."""
+        try:
+            with np.load(path) as stored:
+                if int(stored['format']) != INDEX_FORMAT:
+                    return None
+                return cls(stored['vectors'], stored['centroids'], stored['order'],
+                           stored['offsets'], str(stored['digest']))
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def load_index(bib_path, abstracts, source='tfidf'):
+    """
+    The IVF index of ``abstracts``, rebuilt only when they changed.
+
+    Returns:
+        tuple: ``(index, encode)``, where ``encode`` maps texts to query vectors.
+    """
+    vectors, encode, digest = paper_vectors(bib_path, abstracts, source)
+    directory = os.path.join(cache_dir(bib_path), 'ann')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.path.basename(bib_path)}.{source}.npz')
+    index = IVFIndex.load(path)
+    if index is None or index.digest != digest:
+        index = IVFIndex.build(vectors, digest=digest)
+        index.save(path)
+    return index, encode
+
+
+def similar_papers(index, rows, k=10, probes=DEFAULT_PROBES):
+    """Neighbours of indexed papers, leaving each paper out of its own results."""
+    rows = list(rows)
+    return index.search(index.vectors[rows], k, probes, exclude=rows)
+
+
+def category_outliers(index, keys, categories, k=5, probes=DEFAULT_PROBES, field='application_category'):
+    """
+    Papers whose category differs from the majority category of their neighbours.
+
+    Args:
+        keys (list): Citation key of each indexed row.
+        categories (dict): ``{citation_key: paper}`` from categorized_papers.json.
+
+    Returns:
+        list: ``(key, category, neighbour category, neighbour share)`` tuples.
+    """
+    neighbours, _ = similar_papers(index, range(len(index)), k, probes)
+    outliers = []
+    for row, found in enumerate(neighbours):
+        paper = categories.get(keys[row])
+        if paper is None:
+            continue
+        votes = Counter(categories[keys[j]][field] for j in found
+                        if j >= 0 and keys[j] in categories)
+        if not votes:
+            continue
+        majority, count = votes.most_common(1)[0]
+        if majority != paper[field] and count * 2 > sum(votes.values()):
+            outliers.append((keys[row], paper[field], majority, count / sum(votes.values())))
+    return outliers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find papers similar to others or to a text.")
+    parser.add_argument('keys', nargs='*', help="citation keys of the query papers")
+    parser.add_argument('--text', action='append', default=[], help="free-text query; may be repeated")
+    parser.add_argument('--bib', default='/Users/woodj/Desktop/congenial-potato/refs.bib')
+    parser.add_argument('--vectors', choices=('tfidf', 'embeddings'), default='tfidf')
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--probes', type=int, default=DEFAULT_PROBES)
+    parser.add_argument('--check-categories', metavar='JSON',
+                        help="report papers whose categories disagree with their neighbours'")
+    args = parser.parse_args()
+
+    entries = [entry for entry in load_corpus(args.bib) if 'abstract' in entry.fields]
+    keys = [entry.key for entry in entries]
+    index, encode = load_index(args.bib, [entry.get('abstract') for entry in entries], args.vectors)
+
+    def print_results(label, rows, scores):
+        print(label)
+        for row, score in zip(rows, scores):
+            if row >= 0:
+                print(f"  {score:.3f}  {keys[row]}: {entries[row].title}")
+
+    rows = []
+    for key in args.keys:
+        if key in keys:
+            rows.append(keys.index(key))
+        else:
+            print(f"{key}: not in the bib or has no abstract")
+    if rows:
+        for row, found, scores in zip(rows, *similar_papers(index, rows, args.k, args.probes)):
+            print_results(f"{keys[row]}: {entries[row].title}", found, scores)
+    if args.text:
+        for text, found, scores in zip(args.text, *index.search(encode(args.text), args.k, args.probes)):
+            print_results(f'"{text}"', found, scores)
+
+    if args.check_categories:
+        with open(args.check_categories, 'r') as f:
+            categories = {paper['citation_key']: paper for paper in json.load(f)}
+    for field in ('application_category', 'methodology_category') if args.check_categories else ():
+        print(f"\n{field}: papers unlike their neighbours")
+        for key, category, majority, share in category_outliers(index, keys, categories, 5, args.probes, field):
+            print(f"  {key}: {category} (neighbours: {share:.0%} {majority})")
@@ -0,0 +1,317 @@
+"""
+Offline full-text search over a bib file.
+
+``load_text_index`` keeps a positional inverted index of every entry's
+title, abstract and keywords in ``.bibcache/<bib>.textindex.pickle``. Each
+call compares the index with the current corpus and only indexes entries
+whose text changed; entries that disappeared are tombstoned, and the index
+is rebuilt once tombstones outnumber live entries.
+
+Postings are stored per term as one flat ``array('I')``:
+``doc, count, position * count, doc, count, ...`` with documents in
+increasing order.
+
+Queries use the syntax main.py sends to Semantic Scholar, as built by
+query_syntax.build_query_group and quote_keyword:
+
+    ("artificial intelligence" OR "machine learning") AND fisheries
+
+AND and OR (upper case), parentheses, quoted phrases and a leading '-' on
+a word or phrase for exclusion are supported; terms next to each other are
+ANDed. Words are matched case- and accent-insensitively, as whole words.
+
+Usage:
+    python text_index.py '(plankton OR "marine biomass") AND "deep learning"' --bib ../refs.bib
+    python text_index.py 'plankton' --bib ../refs.bib --output plankton.bib
+
+An ``--output`` bib can be fed to filter_type.py, filter_topic_and_keywords_v3.py
+or manual_categorization.py like any other bib file.
+"""
+
+import argparse
+import hashlib
+import os
+import pickle
+import re
+from array import array
+from collections import Counter
+
+from bibtex import iter_entries, normalize_title
+from corpus import cache_dir, load_corpus
+
+INDEX_VERSION = 1
+INDEXED_FIELDS = ('title', 'abstract', 'keywords')
+
+# Positions of consecutive fields are this far apart, so phrases never
+# match across a field boundary.
+_FIELD_GAP = 1 << 20
+
+_QUERY_TOKEN = re.compile(r'\s*(?:(\()|(\))|(-?)"([^"]*)"|([^\s()"]+))')
+
+
+def tokenize(text):
+    """Lower-case, accent-free alphanumeric words."""
+    return normalize_title(text).split()
+
+
+def entry_text_digest(entry):
+    """Identifies an entry by its key and indexed text."""
+    parts = [entry.key] + [entry.text(name) for name in INDEXED_FIELDS]
+    return hashlib.sha1('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+class TextIndex:
+    """
+    Positional inverted index.
+
+    Attributes:
+        docs (list): ``(citation_key, digest)`` per document id; None once removed.
+        postings (dict): ``{term: array('I')}`` in the flat format above.
+    """
+
+    def __init__(self):
+        self.docs = []
+        self.postings = {}
+        self.removed = 0
+
+    def __len__(self):
+        return len(self.docs) - self.removed
+
+    def add(self, key, digest, fields):
+        """Indexes one document; ``fields`` is a list of texts."""
+        doc = len(self.docs)
+        self.docs.append((key, digest))
+        positions = {}
+        for field_number, text in enumerate(fields):
+            base = field_number * _FIELD_GAP
+            for offset, term in enumerate(tokenize(text)):
+                positions.setdefault(term, []).append(base + offset)
+        for term, where in positions.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = array('I')
+            postings.append(doc)
+            postings.append(len(where))
+            postings.extend(where)
+        return doc
+
+    def remove(self, doc):
+        if self.docs[doc] is not None:
+            self.docs[doc] = None
+            self.removed += 1
+
+    def positions(self, term):
+        """``{doc: positions}`` of a term, skipping removed documents."""
+        postings = self.postings.get(term)
+        found = {}
+        if postings is None:
+            return found
+        i = 0
+        while i < len(postings):
+            doc, count = postings[i], postings[i + 1]
+            if self.docs[doc] is not None:
+                found[doc] = postings[i + 2:i + 2 + count]
+            i += 2 + count
+        return found
+
+    def term_docs(self, term):
+        return set(self.positions(term))
+
+    def phrase_docs(self, terms):
+        """Documents containing ``terms`` consecutively."""
+        if len(terms) == 1:
+            return self.term_docs(terms[0])
+        lists = [self.positions(term) for term in terms]
+        docs = set(lists[0])
+        for found in lists[1:]:
+            docs &= set(found)
+        matches = set()
+        for doc in docs:
+            following = [set(found[doc]) for found in lists[1:]]
+            for start in lists[0][doc]:
+                if all(start + i + 1 in where for i, where in enumerate(following)):
+                    matches.add(doc)
+                    break
+        return matches
+
+    def live_docs(self):
+        return {doc for doc, record in enumerate(self.docs) if record is not None}
+
+    def search(self, query):
+        """Document ids matching ``query``, in index order."""
+        return sorted(_QueryParser(query, self).parse())
+
+    def keys(self, docs):
+        return [self.docs[doc][0] for doc in docs]
+
+    def update(self, entries):
+        """
+        Brings the index in line with ``entries``.
+
+        Returns:
+            tuple: ``(added, removed)`` document counts.
+        """
+        current = Counter()
+        by_digest = {}
+        for entry in entries:
+            digest = entry_text_digest(entry)
+            current[digest] += 1
+            by_digest.setdefault(digest, []).append(entry)
+
+        removed = 0
+        for doc, record in enumerate(self.docs):
+            if record is None:
+                continue
+            if current[record[1]] > 0:
+                current[record[1]] -= 1
+            else:
+                self.remove(doc)
+                removed += 1
+
+        added = 0
+        for digest, count in current.items():
+            for entry in by_digest[digest][len(by_digest[digest]) - count:]:
+                self.add(entry.key, digest, [entry.text(name) for name in INDEXED_FIELDS])
+                added += 1
+        return added, removed
+
+
+class _QueryParser:
+    """Recursive-descent parser that evaluates a query to a set of documents."""
+
+    def __init__(self, query, index):
+        self.tokens = []
+        position = 0
+        query = query.strip()
+        while position < len(query):
+            match = _QUERY_TOKEN.match(query, position)
+            if match is None:
+                raise ValueError(f"Cannot parse query at: {query[position:]!r}")
+            position = match.end()
+            if match.group(1):
+                self.tokens.append(('(', None))
+            elif match.group(2):
+                self.tokens.append((')', None))
+            elif match.group(4) is not None:
+                self.tokens.append(('term', (match.group(4), match.group(3) == '-')))
+            elif match.group(5) in ('AND', 'OR'):
+                self.tokens.append((match.group(5), None))
+            else:
+                word = match.group(5)
+                excluded = word.startswith('-')
+                self.tokens.append(('term', (word[1:] if excluded else word, excluded)))
+        self.index = index
+        self.position = 0
+
+    def _peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def _next(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            return set()
+        result = self._or()
+        if self._peek() is not None:
+            raise ValueError(f"Unexpected {self._peek()!r} in query")
+        return result
+
+    def _or(self):
+        result = self._and()
+        while self._peek() == 'OR':
+            self._next()
+            result = result | self._and()
+        return result
+
+    def _and(self):
+        result = self._unary()
+        while self._peek() in ('AND', '(', 'term'):
+            if self._peek() == 'AND':
+                self._next()
+            result = result & self._unary()
+        return result
+
+    def _unary(self):
+        kind = self._peek()
+        if kind is None:
+            raise ValueError("Query ends unexpectedly")
+        kind, value = self._next()
+        if kind == '(':
+            result = self._or()
+            if self._peek() != ')':
+                raise ValueError("Missing ')' in query")
+            self._next()
+            return result
+        if kind == 'term':
+            text, excluded = value
+            found = self._terms(text)
+            return self.index.live_docs() - found if excluded else found
+        raise ValueError(f"Unexpected {kind!r} in query")
+
+    def _terms(self, text):
+        terms = tokenize(text)
+        if not terms:
+            raise ValueError(f"Nothing to search for in {text!r}")
+        return self.index.phrase_docs(terms)
+
+
+def index_path(bib_path):
+    return os.path.join(cache_dir(bib_path), os.path.basename(bib_path) + '.textindex.pickle')
+
+
+def load_text_index(bib_path):
+    """The text index of a bib file, updated for any changes since it was saved."""
+    path = index_path(bib_path)
+    index = None
+    try:
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+        if payload.get('version') == INDEX_VERSION:
+            index = payload['index']
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    entries = load_corpus(bib_path)
+    if index is None or index.removed > len(index):
+        index = TextIndex()
+    added, removed = index.update(entries)
+    if added or removed or not os.path.exists(path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': INDEX_VERSION, 'index': index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    return index
+
+
+def matching_entries(bib_path, query, keep_raw=False):
+    """Entries of a bib file matching ``query``, in file order."""
+    index = load_text_index(bib_path)
+    # The index covers enriched entries, so match back by citation key.
+    wanted = Counter(index.keys(index.search(query)))
+    matches = []
+    for entry in iter_entries(bib_path, keep_raw=keep_raw):
+        if wanted[entry.key] > 0:
+            wanted[entry.key] -= 1
+            matches.append(entry)
+    return matches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search a bib file offline.")
+    parser.add_argument('query', help='e.g. \'(plankton OR "marine biomass") AND "deep learning"\'')
+    parser.add_argument('--bib', default='/Users/woodj/Desktop/congenial-potato/refs.bib')
+    parser.add_argument('--output', help="write the matching entries to this bib file")
+    args = parser.parse_args()
+
+    matches = matching_entries(args.bib, args.query, keep_raw=bool(args.output))
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write('\n\n'.join(entry.raw for entry in matches) + '\n')
+        print(f"Wrote {len(matches)} entries to {args.output}")
+    else:
+        for entry in matches:
+            print(f"{entry.key}: {entry.title}")
+        print(f"{len(matches)} matching entries")
@@ -1,31 +1,43 @@
-import re
-from sklearn.feature_extraction.text import CountVectorizer
+from corpus import load_corpus
+from features import document_term_matrix, dtm_cache_dir
+from online_lda import update_topic_model
 from sklearn.decomposition import LatentDirichletAllocation
 
-def topic_modeling(input_file, num_topics=5, num_words=3):
-    with open(input_file, 'r') as f:
-        content = f.read()
-
-    entries = content.split('\n@')
-    abstracts = []
+def print_topics(components, vocabulary, num_words):
+    for i, topic in enumerate(components):
+        print(f'Topic {i + 1}:')
+        print(" ".join([vocabulary[j] for j in topic.argsort()[-num_words:]]))
 
-    for entry in entries:
-        if not entry.strip():
-            continue
+def topic_modeling(input_file, num_topics=5, num_words=3, online=False):
+    """
+    Prints the top words of an LDA model of the abstracts.
 
-        if 'abstract' in entry:
-            abstract_match = re.search(r'abstract\s*=\s*{(.*?)}', entry, re.IGNORECASE | re.DOTALL)
-            if abstract_match:
-                abstracts.append(abstract_match.group(1))
+    Args:
+        input_file (str): The bib file.
+        num_topics (int): Number of topics.
+        num_words (int): Words printed per topic.
+        online (bool): Update the saved online model with the papers added
+                       since the last run instead of refitting (see online_lda.py).
+    """
+    abstracts = [entry.get('abstract') for entry in load_corpus(input_file) if 'abstract' in entry.fields]
 
     if not abstracts:
         print("No abstracts found.")
         return
 
-    # Create a CountVectorizer to convert the text data to a matrix of token counts
-    vectorizer = CountVectorizer(max_df=0.95, min_df=2, stop_words='english')
+    if online:
+        try:
+            model, trained = update_topic_model(input_file, num_topics)
+        except ValueError:
+            print("Could not vectorize abstracts. Maybe they are all stop words?")
+            return
+        print(f"Online model updated with {trained} abstracts ({model.documents} seen in total).")
+        print_topics(model.lda.components_, model.vocabulary, num_words)
+        return
+
+    # Convert the text data to a matrix of token counts (cached per corpus)
     try:
-        dtm = vectorizer.fit_transform(abstracts)
+        features = document_term_matrix(abstracts, cache_directory=dtm_cache_dir(input_file))
     except ValueError:
         print("Could not vectorize abstracts. Maybe they are all stop words?")
         return
@@ -35,12 +47,10 @@ def topic_modeling(input_file, num_topics=5, num_words=3):
     lda = LatentDirichletAllocation(n_components=num_topics, random_state=0)
 
     # Fit the LDA model to the document-term matrix
-    lda.fit(dtm)
+    lda.fit(features.matrix)
 
     # Print the top words for each topic
-    for i, topic in enumerate(lda.components_):
-        print(f'Topic {i + 1}:')
-        print(" ".join([vectorizer.get_feature_names_out()[j] for j in topic.argsort()[-num_words:]]))
+    print_topics(lda.components_, features.vocabulary, num_words)
 
 if __name__ == "__main__":
     topic_modeling("/Users/woodj/Desktop/congenial-potato/refs.bib")
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+Persisted LDA topic model with fast assignment of new documents.
+
+``load_topic_model`` returns the saved model for a bib file and topic count,
+fitting (and saving) one only when none exists or ``refit=True``. Models are
+stored as versioned artifacts, ``.bibcache/topic_models/<bib>.lda<K>.v<N>.pickle``,
+holding the frozen vectorizer, the fitted LDA model and the top words of each
+topic; a refit writes version N+1 and leaves earlier versions in place.
+
+Documents are assigned to topics with ``transform`` only, and assignments are
+cached by abstract hash next to the artifact, so on later runs only new or
+edited abstracts are transformed at all.
+
+Topic indices depend on the fitted model. To keep a selection stable across
+refits, select topics by signature: a few words that characterize the
+topic. ``TopicModel.select`` resolves each signature to the topic that
+gives its words the most probability mass.
+"""
+
+import hashlib
+import os
+import pickle
+import re
+import time
+
+import numpy as np
+from sklearn.decomposition import LatentDirichletAllocation
+
+from corpus import cache_dir
+from features import document_term_matrix, dtm_cache_dir
+
+ARTIFACT_FORMAT = 1
+SIGNATURE_WORDS = 10
+
+
+def abstract_digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class TopicModel:
+    """
+    A fitted LDA model together with the vectorizer it was trained with.
+
+    Attributes:
+        vectorizer (CountVectorizer): Frozen to the training vocabulary.
+        lda (LatentDirichletAllocation): The fitted model.
+        version (int): Artifact version; increases with every refit.
+        corpus_digest (str): Digest of the training texts and vectorizer
+                             parameters (see features.corpus_digest).
+    """
+
+    def __init__(self, vectorizer, lda, version=1, corpus_digest=None):
+        self.vectorizer = vectorizer
+        self.lda = lda
+        self.version = version
+        self.corpus_digest = corpus_digest
+        self.created = time.time()
+        self._assignments = {}
+        self._assignments_path = None
+
+    @classmethod
+    def fit(cls, texts, num_topics, random_state=0, cache_directory=None, version=1):
+        features = document_term_matrix(texts, cache_directory=cache_directory)
+        lda = LatentDirichletAllocation(n_components=num_topics, random_state=random_state)
+        lda.fit(features.matrix)
+        return cls(features.vectorizer(), lda, version, features.digest)
+
+    @property
+    def num_topics(self):
+        return self.lda.n_components
+
+    @property
+    def vocabulary(self):
+        return self.vectorizer.get_feature_names_out()
+
+    def top_words(self, num_words=SIGNATURE_WORDS):
+        vocabulary = self.vocabulary
+        return [[vocabulary[j] for j in topic.argsort()[:-num_words - 1:-1]]
+                for topic in self.lda.components_]
+
+    def transform(self, texts):
+        """Document-topic distributions of ``texts``, from the cache when possible."""
+        digests = [abstract_digest(text) for text in texts]
+        missing = [i for i, digest in enumerate(digests) if digest not in self._assignments]
+        if missing:
+            rows = self.lda.transform(self.vectorizer.transform([texts[i] for i in missing]))
+            for i, row in zip(missing, rows):
+                self._assignments[digests[i]] = row.astype(np.float32)
+            self._save_assignments()
+        if not texts:
+            return np.empty((0, self.num_topics), dtype=np.float32)
+        return np.vstack([self._assignments[digest] for digest in digests])
+
+    def topic_for_signature(self, words):
+        """Index of the topic whose word distribution favours ``words`` most."""
+        index = self.vectorizer.vocabulary_
+        columns = [index[word] for word in words if word in index]
+        if not columns:
+            raise ValueError(f"None of the signature words {list(words)} are in the vocabulary")
+        distributions = self.lda.components_ / self.lda.components_.sum(axis=1, keepdims=True)
+        return int(distributions[:, columns].sum(axis=1).argmax())
+
+    def select(self, selectors):
+        """
+        Topic indices for a list of selectors.
+
+        A selector is a topic index or a signature: a list of words (or a
+        space-separated string) describing the topic.
+        """
+        topics = set()
+        for selector in selectors:
+            if isinstance(selector, (int, np.integer)):
+                if not 0 <= selector < self.num_topics:
+                    raise ValueError(f"Topic {selector} out of range for {self.num_topics} topics")
+                topics.add(int(selector))
+            else:
+                words = selector.split() if isinstance(selector, str) else list(selector)
+                topics.add(self.topic_for_signature(words))
+        return topics
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'format': ARTIFACT_FORMAT, 'version': self.version,
+                         'corpus_digest': self.corpus_digest, 'created': self.created,
+                         'vectorizer': self.vectorizer, 'lda': self.lda,
+                         'top_words': self.top_words()},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._attach(path)
+
+    @classmethod
+    def load(cls, path):
+        """The model saved at ``path``, or None if unreadable or of another format."""
+        try:
+            with open(path, 'rb') as f:
+                payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        if not isinstance(payload, dict) or payload.get('format') != ARTIFACT_FORMAT:
+            return None
+        model = cls(payload['vectorizer'], payload['lda'], payload['version'],
+                    payload['corpus_digest'])
+        model.created = payload['created']
+        model._attach(path)
+        return model
+
+    def _attach(self, path):
+        """Binds the assignment cache stored next to the artifact at ``path``."""
+        self._assignments_path = path[:-len('.pickle')] + '.assignments.pickle'
+        try:
+            with open(self._assignments_path, 'rb') as f:
+                self._assignments = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+    def _save_assignments(self):
+        if self._assignments_path is None:
+            return
+        tmp_path = self._assignments_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self._assignments, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._assignments_path)
+
+
+def artifact_dir(bib_path):
+    path = os.path.join(cache_dir(bib_path), 'topic_models')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def artifact_versions(bib_path, num_topics):
+    """``{version: path}`` of the saved models of a bib file and topic count."""
+    pattern = re.compile(re.escape(f'{os.path.basename(bib_path)}.lda{num_topics}.v') + r'(\d+)\.pickle')
+    versions = {}
+    directory = artifact_dir(bib_path)
+    for name in os.listdir(directory):
+        match = pattern.fullmatch(name)
+        if match:
+            versions[int(match.group(1))] = os.path.join(directory, name)
+    return versions
+
+
+def load_topic_model(bib_path, texts, num_topics=10, refit=False, random_state=0):
+    """
+    The latest saved topic model of a bib file, fitting one on ``texts`` if needed.
+
+    With ``refit=True`` a new model is fitted and saved as the next version.
+    """
+    versions = artifact_versions(bib_path, num_topics)
+    if versions and not refit:
+        model = TopicModel.load(versions[max(versions)])
+        if model is not None:
+            return model
+
+    version = max(versions, default=0) + 1
+    model = TopicModel.fit(texts, num_topics, random_state, dtm_cache_dir(bib_path), version)
+    path = os.path.join(artifact_dir(bib_path),
+                        f'{os.path.basename(bib_path)}.lda{num_topics}.v{version}.pickle')
+    model.save(path)
+    return model
@@ -0,0 +1,163 @@
+"""
+Sweep the number of LDA topics and score each model.
+
+Fits LatentDirichletAllocation for a range of ``n_components`` in a process
+pool. Every worker receives the shared document-term matrix (see
+features.py) once, when it starts, rather than with every task. For each K
+the sweep reports:
+
+  - held-out perplexity, from a model fitted on the remaining documents
+    (lower is better), and
+  - NPMI coherence of each topic's top words, averaged over topics (higher
+    is better; -1 means the words never appear together, 1 means they
+    always do).
+
+Coherence is computed for all models at once from one sparse document
+co-occurrence matrix of every top word, instead of counting pairs in Python.
+
+Usage:
+    python topic_sweep.py --bib ../refs.bib --k-min 2 --k-max 20 --workers 4
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.decomposition import LatentDirichletAllocation
+
+from corpus import load_corpus
+from features import document_term_matrix, dtm_cache_dir
+
+_worker_data = {}
+
+
+def _init_worker(train, test):
+    _worker_data['train'] = train
+    _worker_data['test'] = test
+
+
+def _fit(k, top_n, random_state):
+    train = _worker_data['train']
+    test = _worker_data['test']
+    began = time.perf_counter()
+    lda = LatentDirichletAllocation(n_components=k, random_state=random_state)
+    lda.fit(train)
+    seconds = time.perf_counter() - began
+    perplexity = lda.perplexity(test if test.shape[0] else train)
+    top_words = np.argsort(-lda.components_, axis=1)[:, :top_n]
+    return k, perplexity, top_words, seconds
+
+
+def split_documents(matrix, holdout, random_state=0):
+    """Splits DTM rows into a training and a held-out matrix."""
+    rows = np.random.RandomState(random_state).permutation(matrix.shape[0])
+    cut = int(round(len(rows) * (1 - holdout)))
+    return matrix[np.sort(rows[:cut])], matrix[np.sort(rows[cut:])]
+
+
+def npmi_coherence(matrix, topic_words):
+    """
+    NPMI coherence of topics from document co-occurrence.
+
+    Args:
+        matrix (scipy.sparse matrix): Documents x terms counts.
+        topic_words (list): One ``(topics, n)`` array of term indices per
+                            model, e.g. the top words of each topic.
+
+    Returns:
+        list: One array of per-topic coherences per model.
+    """
+    words = np.unique(np.concatenate([np.ravel(top) for top in topic_words]))
+    present = (matrix[:, words] > 0).astype(np.float64)
+    joint = (present.T @ present).toarray() / matrix.shape[0]
+    marginal = np.diag(joint)
+
+    scores = []
+    for top in topic_words:
+        position = np.searchsorted(words, top)
+        p_ij = joint[position[:, :, None], position[:, None, :]]
+        p_i = marginal[position]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            npmi = np.log(p_ij / (p_i[:, :, None] * p_i[:, None, :])) / -np.log(p_ij)
+        npmi[p_ij == 0] = -1.0
+        npmi[p_ij >= 1] = 1.0
+        upper = np.triu_indices(top.shape[1], 1)
+        scores.append(npmi[:, upper[0], upper[1]].mean(axis=1))
+    return scores
+
+
+def sweep(matrix, k_values, top_n=10, holdout=0.1, workers=None, random_state=0):
+    """
+    Fits one LDA model per K in ``k_values``.
+
+    Returns:
+        list: ``{'k', 'perplexity', 'coherence', 'topic_coherence',
+              'top_words', 'seconds'}`` dicts, in order of K.
+    """
+    train, test = split_documents(matrix, holdout, random_state)
+    k_values = sorted(set(k_values))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(train, test)) as pool:
+        fits = list(pool.map(_fit, k_values, [top_n] * len(k_values),
+                             [random_state] * len(k_values)))
+
+    coherences = npmi_coherence(matrix, [top_words for _, _, top_words, _ in fits])
+    results = []
+    for (k, perplexity, top_words, seconds), topic_coherence in zip(fits, coherences):
+        results.append({'k': k, 'perplexity': perplexity, 'coherence': topic_coherence.mean(),
+                        'topic_coherence': topic_coherence, 'top_words': top_words,
+                        'seconds': seconds})
+    return results
+
+
+def print_table(results):
+    best = max(results, key=lambda result: result['coherence'])
+    print(f"{'K':>4} {'Perplexity':>12} {'NPMI':>8} {'Fit (s)':>9}")
+    for result in results:
+        marker = '  <- most coherent' if result is best else ''
+        print(f"{result['k']:>4} {result['perplexity']:>12.1f} {result['coherence']:>8.3f} "
+              f"{result['seconds']:>9.2f}{marker}")
+
+
+def plot_sweep(results, output_path):
+    import matplotlib.pyplot as plt
+
+    k_values = [result['k'] for result in results]
+    fig, ax1 = plt.subplots(figsize=(8, 5))
+    ax1.plot(k_values, [result['perplexity'] for result in results], marker='o', color='tab:blue')
+    ax1.set_xlabel('Number of Topics (K)')
+    ax1.set_ylabel('Held-out Perplexity', color='tab:blue')
+    ax2 = ax1.twinx()
+    ax2.plot(k_values, [result['coherence'] for result in results], marker='s', color='tab:red')
+    ax2.set_ylabel('NPMI Coherence', color='tab:red')
+    ax1.set_title('LDA Topic Count Sweep')
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close(fig)
+    print(f"Saved {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep the number of LDA topics.")
+    parser.add_argument('--bib', default='/Users/woodj/Desktop/congenial-potato/refs.bib')
+    parser.add_argument('--k-min', type=int, default=2)
+    parser.add_argument('--k-max', type=int, default=20)
+    parser.add_argument('--k-step', type=int, default=1)
+    parser.add_argument('--top-n', type=int, default=10, help="top words per topic scored for coherence")
+    parser.add_argument('--holdout', type=float, default=0.1, help="fraction of documents for perplexity")
+    parser.add_argument('--workers', type=int, help="processes (default: one per CPU)")
+    parser.add_argument('--plot', default='/Users/woodj/Desktop/congenial-potato/figures/topic_sweep.png')
+    args = parser.parse_args()
+
+    abstracts = [entry.get('abstract') for entry in load_corpus(args.bib) if 'abstract' in entry.fields]
+    features = document_term_matrix(abstracts, cache_directory=dtm_cache_dir(args.bib))
+    print(f"{features.shape[0]} documents, {features.shape[1]} terms")
+
+    results = sweep(features.matrix, range(args.k_min, args.k_max + 1, args.k_step),
+                    args.top_n, args.holdout, args.workers)
+    print_table(results)
+    if args.plot:
+        os.makedirs(os.path.dirname(os.path.abspath(args.plot)), exist_ok=True)
+        plot_sweep(results, args.plot)
@@ -0,0 +1,163 @@
+"""
+Topic prevalence and top-word drift per publication year.
+
+One LDA model is fitted for the whole corpus (the persisted model of
+topic_store.py, over the cached document-term matrix of features.py) and
+every paper's topic distribution is aggregated by year, so no model is
+fitted per year and adding years only adds rows to the aggregation:
+
+  - prevalence: a sparse year-by-document indicator matrix times the
+    document-topic matrix gives each year's mean topic distribution;
+  - drift: a sparse (year, topic)-by-document matrix of topic weights
+    times the document-term matrix gives, for every year and topic, the
+    term counts attributed to that topic. Their top words are compared
+    with the topic's overall top words.
+
+Usage:
+    python topics_over_time.py --bib ../refs.bib --num-topics 10
+"""
+
+import argparse
+import os
+
+import numpy as np
+from scipy import sparse
+
+from corpus import load_corpus
+from features import document_term_matrix, dtm_cache_dir
+from topic_store import load_topic_model
+
+# LDA gives every topic a sliver of every document, so a topic that is
+# practically absent from a year still gets "top words" there (those of
+# that year's other topics). Below this mean share, a topic has none.
+MIN_PREVALENCE = 0.01
+
+
+def topics_over_time(doc_topics, years, dtm=None, num_words=5, min_prevalence=MIN_PREVALENCE):
+    """
+    Aggregates document-topic distributions by year.
+
+    Args:
+        doc_topics (numpy.ndarray): ``(documents, topics)`` distributions.
+        years (list): Publication year of each document.
+        dtm (scipy.sparse matrix): ``(documents, terms)`` counts; needed for
+                                   per-year top words.
+        num_words (int): Top words kept per year and topic.
+        min_prevalence (float): Topics with a smaller mean share in a year
+                                get no top words for it.
+
+    Returns:
+        dict: ``years`` (sorted), ``counts`` (papers per year),
+              ``prevalence`` (``(years, topics)`` mean distribution) and,
+              with a DTM, ``top_words`` (``(years, topics, num_words)``
+              term indices, -1 where a topic is below ``min_prevalence``
+              that year or a word has no weight).
+    """
+    unique_years, year_index = np.unique(np.asarray(years), return_inverse=True)
+    n_docs, n_topics = doc_topics.shape
+    n_years = len(unique_years)
+
+    indicator = sparse.csr_matrix((np.ones(n_docs), (year_index, np.arange(n_docs))),
+                                  shape=(n_years, n_docs))
+    counts = np.asarray(indicator.sum(axis=1)).ravel()
+    prevalence = (indicator @ doc_topics) / counts[:, None]
+    result = {'years': unique_years, 'counts': counts, 'prevalence': prevalence}
+
+    if dtm is not None:
+        # Row (year * n_topics + topic) holds that topic's weight in each
+        # document of that year.
+        rows = (year_index[:, None] * n_topics + np.arange(n_topics)).ravel()
+        columns = np.repeat(np.arange(n_docs), n_topics)
+        weights = sparse.csr_matrix((doc_topics.ravel(), (rows, columns)),
+                                    shape=(n_years * n_topics, n_docs))
+        term_weights = (weights @ dtm).toarray().reshape(n_years, n_topics, -1)
+        top = np.argsort(-term_weights, axis=2)[:, :, :num_words]
+        empty = ((np.take_along_axis(term_weights, top, axis=2) <= 0)
+                 | (prevalence < min_prevalence)[:, :, None])
+        result['top_words'] = np.where(empty, -1, top)
+    return result
+
+
+def word_drift(top_words, overall_top_words):
+    """
+    Jaccard overlap of each year's top words with the topic's overall top words.
+
+    Args:
+        top_words (numpy.ndarray): ``(years, topics, n)`` term indices.
+        overall_top_words (numpy.ndarray): ``(topics, m)`` term indices.
+
+    Returns:
+        numpy.ndarray: ``(years, topics)`` overlaps in [0, 1].
+    """
+    n_years, n_topics, _ = top_words.shape
+    overlap = np.zeros((n_years, n_topics))
+    for topic in range(n_topics):
+        overall = set(overall_top_words[topic])
+        for year in range(n_years):
+            words = {word for word in top_words[year, topic] if word >= 0}
+            if words:
+                overlap[year, topic] = len(words & overall) / len(words | overall)
+    return overlap
+
+
+def print_trends(result, vocabulary, overall_top_words, drift):
+    n_topics = result['prevalence'].shape[1]
+    for topic in range(n_topics):
+        print(f"Topic {topic}: {' '.join(vocabulary[j] for j in overall_top_words[topic][:5])}")
+        for y, year in enumerate(result['years']):
+            words = [vocabulary[j] for j in result['top_words'][y, topic] if j >= 0]
+            print(f"  {year}: {result['prevalence'][y, topic]:.2f} "
+                  f"(overlap {drift[y, topic]:.2f}) {' '.join(words)}")
+
+
+def plot_trends(result, labels, output_path):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 7))
+    ax.stackplot(result['years'], result['prevalence'].T, labels=labels, alpha=0.85)
+    ax.set_xlabel('Year')
+    ax.set_ylabel('Mean Topic Share')
+    ax.set_title('Topic Prevalence Over Time')
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize='small')
+    plt.tight_layout()
+    plt.savefig(output_path, bbox_inches='tight')
+    plt.close(fig)
+    print(f"Saved {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Topic prevalence and top words per year.")
+    parser.add_argument('--bib', default='/Users/woodj/Desktop/congenial-potato/refs.bib')
+    parser.add_argument('--num-topics', type=int, default=10)
+    parser.add_argument('--num-words', type=int, default=5)
+    parser.add_argument('--plot', default='/Users/woodj/Desktop/congenial-potato/figures/topics_over_time.png')
+    args = parser.parse_args()
+
+    entries = [entry for entry in load_corpus(args.bib) if 'abstract' in entry.fields]
+    abstracts = [entry.get('abstract') for entry in entries]
+    model = load_topic_model(args.bib, abstracts, args.num_topics)
+    features = document_term_matrix(abstracts, cache_directory=dtm_cache_dir(args.bib))
+
+    # The saved model may predate some abstracts, so the DTM is re-expressed
+    # in its vocabulary; for an up-to-date model this is the cached matrix.
+    if list(features.vocabulary) == list(model.vocabulary):
+        dtm = features.matrix
+    else:
+        dtm = model.vectorizer.transform(abstracts)
+
+    dated = np.array([entry.year is not None for entry in entries])
+    doc_topics = model.transform(abstracts)[dated]
+    years = [entry.year for entry in entries if entry.year is not None]
+    result = topics_over_time(doc_topics, years, dtm[np.flatnonzero(dated)], args.num_words)
+
+    vocabulary = model.vocabulary
+    overall = np.argsort(-model.lda.components_, axis=1)[:, :10]
+    print_trends(result, vocabulary, overall, word_drift(result['top_words'], overall))
+
+    if args.plot:
+        os.makedirs(os.path.dirname(os.path.abspath(args.plot)), exist_ok=True)
+        labels = [f"{topic}: {' '.join(vocabulary[j] for j in overall[topic][:3])}"
+                  for topic in range(args.num_topics)]
+        plot_trends(result, labels, args.plot)